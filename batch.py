@@ -0,0 +1,154 @@
+"""
+Batch solving of large puzzle corpora.
+
+solve_many() streams grids through solution.solve() in chunks, either in this process
+or on a process pool, and yields one SolveResult per grid. Only a bounded number of
+chunks is in flight at any time, so an input iterator is consumed lazily and results
+can be written out as they arrive.
+"""
+import collections
+import concurrent.futures
+import itertools
+import os
+import time
+
+import solution
+
+# times a chunk is sent to a pool before a worker crash is blamed on it
+MAX_ATTEMPTS = 2
+
+SolveResult = collections.namedtuple('SolveResult', 'index grid values error elapsed')
+SolveResult.__doc__ = """
+Outcome of one puzzle in a batch.
+    index(int): position of the grid in the input
+    grid(string): the grid as given
+    values(dict): the solution. False if the puzzle has no solution, None on error or timeout
+    error(string): None, 'timeout', 'max_nodes' if the solve ran out of search nodes, or
+        the repr of the exception raised while solving
+    elapsed(float): seconds spent on the puzzle
+"""
+
+
+def solve_chunk(chunk, timeout=None, options=None):
+    """
+    Solve a list of (index, grid) pairs, catching failures per puzzle.
+    Args:
+        chunk(list): (index, grid) pairs
+        timeout(float): seconds allowed per puzzle, passed to solution.solve() as its
+            deadline, which the solver checks as it goes
+        options(dict): keyword arguments for solution.solve(), e.g. max_nodes
+    Returns:
+        a list of SolveResult
+    """
+
+    options = dict(options or {})
+    if timeout is not None:
+        options['deadline'] = timeout
+    results = []
+    for index, grid in chunk:
+        values = None
+        error = None
+        begin = time.perf_counter()
+        try:
+            values = solution.solve(grid, **options)
+        except Exception as e:
+            error = repr(e)
+        if isinstance(values, solution.Outcome):
+            if values.status == 'exhausted':
+                error = 'timeout' if values.reason == 'deadline' else 'max_nodes'
+                values = None
+            else:
+                values = values.values
+        results.append(SolveResult(index, grid, values, error, time.perf_counter() - begin))
+    return results
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of (index, item) pairs of at most `size` items."""
+    iterator = enumerate(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_many(grids, workers=None, chunksize=64, ordered=True, timeout=None, max_pending=None, **options):
+    """
+    Solve many grids, streaming the results.
+    Args:
+        grids(iterable): sudoku grids as strings. Consumed lazily.
+        workers(int): number of worker processes. 0 solves in this process.
+            Default: one per CPU.
+        chunksize(int): grids sent to a worker at a time
+        ordered(bool): yield results in input order. Otherwise in completion order.
+        timeout(float): seconds allowed per puzzle, reported as error 'timeout'
+        max_pending(int): chunks in flight at once. Default: twice the number of workers.
+        options: passed on to solution.solve(), e.g. diagonal=False
+    Returns:
+        an iterator of SolveResult, one per grid
+    """
+
+    chunks = chunked(grids, chunksize)
+    if workers == 0:
+        for chunk in chunks:
+            for result in solve_chunk(chunk, timeout, options):
+                yield result
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    executor = concurrent.futures.ProcessPoolExecutor(workers)
+    # pools started so far; a broken future only triggers a restart if it came from the current one
+    generation = 0
+    # future -> (chunk, attempts, generation); dicts keep submission order
+    pending = {}
+    try:
+        for chunk in itertools.islice(chunks, max_pending):
+            pending[_submit(executor, chunk, timeout, options)] = (chunk, 1, generation)
+
+        while pending:
+            if ordered:
+                future = next(iter(pending))
+            else:
+                done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                future = next(iter(done))
+            chunk, attempts, started = pending.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                if isinstance(e, concurrent.futures.BrokenExecutor) and started == generation:
+                    # a worker died and took every chunk in flight with it. Retry them on a new
+                    # pool; a chunk that was in flight when the pool broke MAX_ATTEMPTS times is
+                    # reported as failed, so a puzzle that kills its worker can't stall the run.
+                    executor.shutdown(wait=False)
+                    executor = concurrent.futures.ProcessPoolExecutor(workers)
+                    generation += 1
+                    in_flight = [(future, (chunk, attempts, started))] + list(pending.items())
+                    pending = {}
+                    for old, (old_chunk, old_attempts, old_started) in in_flight:
+                        finished = old.done() and not old.cancelled() and old.exception() is None
+                        if finished or old_attempts >= MAX_ATTEMPTS:
+                            pending[old] = (old_chunk, old_attempts, old_started)
+                        else:
+                            pending[_submit(executor, old_chunk, timeout, options)] = (
+                                old_chunk, old_attempts + 1, generation)
+                    continue
+                # report every puzzle of the chunk
+                results = [SolveResult(index, grid, None, repr(e), 0.0) for index, grid in chunk]
+            for next_chunk in itertools.islice(chunks, max_pending - len(pending)):
+                pending[_submit(executor, next_chunk, timeout, options)] = (next_chunk, 1, generation)
+            for result in results:
+                yield result
+    finally:
+        executor.shutdown()
+
+
+def _submit(executor, chunk, timeout, options):
+    """Submit a chunk to the pool; if the pool is already broken, return a future holding the error."""
+    try:
+        return executor.submit(solve_chunk, chunk, timeout, options)
+    except concurrent.futures.BrokenExecutor as e:
+        future = concurrent.futures.Future()
+        future.set_exception(e)
+        return future
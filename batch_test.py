@@ -0,0 +1,69 @@
+import batch
+import multiprocessing
+import os
+import solution
+import unittest
+
+
+class TestSolveMany(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    grids = [diagonal_grid, '11' + '.' * 79, 'not a grid', diagonal_grid]
+
+    def check(self, results):
+        self.assertEqual([result.index for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[0].values, solution.solve(self.diagonal_grid))
+        self.assertEqual(results[3].values, results[0].values)
+        self.assertIs(results[1].values, False)
+        self.assertIsNone(results[1].error)
+        self.assertIsNone(results[2].values)
+        self.assertIn('AssertionError', results[2].error)
+
+    def test_in_process(self):
+        self.check(list(batch.solve_many(iter(self.grids), workers=0, chunksize=3)))
+
+    def test_process_pool(self):
+        self.check(list(batch.solve_many(iter(self.grids), workers=2, chunksize=1)))
+
+    def test_completion_order(self):
+        results = batch.solve_many(self.grids, workers=2, chunksize=1, ordered=False)
+        self.check(sorted(results, key=lambda result: result.index))
+
+    @unittest.skipIf(multiprocessing.get_start_method() != 'fork', 'workers must inherit the patched solve')
+    def test_worker_crash(self):
+        solve = solution.solve
+
+        def crash(grid, **options):
+            if grid == 'crash':
+                os._exit(1)
+            return solve(grid, **options)
+
+        # the workers are forked with the patched solve
+        solution.solve = crash
+        try:
+            grids = [self.diagonal_grid, 'crash'] + [self.diagonal_grid] * 4
+            results = list(batch.solve_many(grids, workers=2, chunksize=1))
+        finally:
+            solution.solve = solve
+        self.assertEqual([result.index for result in results], list(range(6)))
+        self.assertIsNone(results[1].values)
+        self.assertIn('BrokenProcessPool', results[1].error)
+        for result in results:
+            self.assertTrue(result.values or 'BrokenProcessPool' in result.error)
+        self.assertTrue(results[-1].values)
+
+    def test_timeout(self):
+        result, = batch.solve_many(['.' * 81], workers=0, timeout=1e-6)
+        self.assertEqual(result.error, 'timeout')
+        self.assertIsNone(result.values)
+
+    def test_max_nodes(self):
+        hard_grid = '1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.8...2.....1'
+        easy_grid = '..8.4.15.2...63......1.5..87.3.219.414..87..58.95....6.8....34......2.67.6.4.8...'
+        results = list(batch.solve_many([hard_grid, easy_grid], workers=0, max_nodes=0, diagonal=False))
+        self.assertEqual(results[0].error, 'max_nodes')
+        self.assertIsNone(results[0].values)
+        self.assertEqual(results[1].values, solution.solve(easy_grid, diagonal=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Benchmark harness for the solver.
+
+Usage: python benchmark.py [--corpus NAME ...] [--target NAME ...] [--repeat N]
+                           [--output results.json] [--baseline baseline.json --threshold 0.25]
+
+Times solve() with each engine and with all deduction strategies, reduce_puzzle() and each
+propagation strategy on the corpora bundled in puzzles/, reports mean/p50/p99 latency,
+puzzles/sec and the mean number of search nodes, and optionally saves the results
+as JSON. With --baseline, exits with status 1 if any corpus/target is more than
+--threshold (a fraction) slower than the stored baseline.
+
+Each corpus is a text file with one puzzle per line. Lines starting with '#' are
+comments; a '# rules: diagonal' line marks a diagonal corpus.
+"""
+import argparse
+import collections
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import bitboard
+import solution
+from instrumentation import SolveStats
+
+PUZZLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles')
+
+Corpus = collections.namedtuple('Corpus', 'name diagonal grids')
+
+
+def load_corpus(path):
+    """
+    Read a corpus file.
+    Args:
+        path(string): file name
+    Returns:
+        a Corpus named after the file
+    """
+
+    diagonal = False
+    grids = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#'):
+                if line.replace(' ', '') == '#rules:diagonal':
+                    diagonal = True
+            elif line:
+                grids.append(line)
+    return Corpus(os.path.splitext(os.path.basename(path))[0], diagonal, grids)
+
+
+def bundled_corpora():
+    """All corpora in puzzles/, by name."""
+    corpora = (load_corpus(path) for path in sorted(glob.glob(os.path.join(PUZZLE_DIR, '*.txt'))))
+    return collections.OrderedDict((corpus.name, corpus) for corpus in corpora)
+
+
+# Targets: given a grid, its geometry and optionally a SolveStats to fill in, do any
+# setup and return the call to time
+
+def prepare_solve(grid, geometry, stats=None, engine='bitboard', strategies=None):
+    diagonal = geometry is solution.diagonal_geometry
+    return lambda: solution.solve(grid, diagonal=diagonal, stats=stats, engine=engine, strategies=strategies)
+
+
+def prepare_dlx(grid, geometry, stats=None):
+    return prepare_solve(grid, geometry, stats, 'dlx')
+
+
+def prepare_strategies(grid, geometry, stats=None):
+    return prepare_solve(grid, geometry, stats, strategies='all')
+
+
+def prepare_strategy(strategy):
+    def prepare(grid, geometry, stats=None):
+        board = bitboard.from_values(solution.grid_values(grid), geometry)
+        return lambda: strategy(board, geometry)
+    return prepare
+
+
+targets = collections.OrderedDict([
+    ('solve', prepare_solve),
+    ('solve_dlx', prepare_dlx),
+    ('solve_strategies', prepare_strategies),
+    ('reduce_puzzle', prepare_strategy(bitboard.reduce_puzzle)),
+    ('eliminate', prepare_strategy(bitboard.eliminate)),
+    ('only_choice', prepare_strategy(bitboard.only_choice)),
+    ('naked_twins', prepare_strategy(bitboard.naked_twins)),
+])
+
+
+def percentile(ordered, fraction):
+    """The value below which `fraction` of a sorted list falls."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_target(corpus, prepare, repeat=3):
+    """
+    Time one target over a corpus.
+    Args:
+        corpus(Corpus): the puzzles
+        prepare(function): a target from `targets`
+        repeat(int): runs per puzzle; the fastest one counts
+    Returns:
+        a dictionary of count, mean_ms, p50_ms, p99_ms, puzzles_per_sec and mean_nodes,
+        the search nodes per puzzle (0 for targets that don't search)
+    """
+
+    geometry = solution.diagonal_geometry if corpus.diagonal else solution.classic_geometry
+    latencies = []
+    nodes = 0
+    for grid in corpus.grids:
+        # counted in a separate run, so the timed runs don't pay for the statistics
+        stats = SolveStats()
+        prepare(grid, geometry, stats)()
+        nodes += stats.nodes
+        best = None
+        for run in range(repeat):
+            call = prepare(grid, geometry)
+            begin = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - begin
+            if best is None or elapsed < best:
+                best = elapsed
+        latencies.append(best)
+    latencies.sort()
+    total = sum(latencies)
+    return {'count': len(latencies),
+            'mean_ms': total / len(latencies) * 1000,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'puzzles_per_sec': len(latencies) / total if total else float('inf'),
+            'mean_nodes': nodes / len(latencies)}
+
+
+def run(corpora, target_names, repeat=3):
+    """
+    Time every target on every corpus.
+    Args:
+        corpora(list): Corpus objects
+        target_names(list): keys of `targets`
+        repeat(int): runs per puzzle
+    Returns:
+        a JSON-serializable dictionary with the environment and {corpus: {target: stats}}
+    """
+
+    results = collections.OrderedDict()
+    for corpus in corpora:
+        results[corpus.name] = collections.OrderedDict(
+            (name, time_target(corpus, targets[name], repeat)) for name in target_names)
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'results': results}
+
+
+def compare(results, baseline, threshold=0.25, metric='p50_ms'):
+    """
+    Find regressions against a baseline.
+    Args:
+        results(dict): output of run()
+        baseline(dict): an earlier output of run()
+        threshold(float): allowed slowdown as a fraction, e.g. 0.25 for 25%
+        metric(string): the statistic to compare
+    Returns:
+        a list of messages, one per corpus/target slower than allowed
+    """
+
+    regressions = []
+    for corpus, timings in results['results'].items():
+        for target, stats in timings.items():
+            before = baseline['results'].get(corpus, {}).get(target)
+            if not before or not before[metric]:
+                continue
+            slowdown = stats[metric] / before[metric] - 1
+            if slowdown > threshold:
+                regressions.append('{}/{}: {} {:.4f} -> {:.4f} ({:+.0%})'.format(
+                    corpus, target, metric, before[metric], stats[metric], slowdown))
+    return regressions
+
+
+def report(results):
+    """Format the results of run() as a table."""
+    lines = ['{:<12} {:<16} {:>6} {:>10} {:>10} {:>10} {:>12} {:>8}'.format(
+        'corpus', 'target', 'count', 'mean ms', 'p50 ms', 'p99 ms', 'puzzles/s', 'nodes')]
+    for corpus, timings in results['results'].items():
+        for target, stats in timings.items():
+            lines.append('{:<12} {:<16} {:>6} {:>10.4f} {:>10.4f} {:>10.4f} {:>12.1f} {:>8.1f}'.format(
+                corpus, target, stats['count'], stats['mean_ms'], stats['p50_ms'], stats['p99_ms'],
+                stats['puzzles_per_sec'], stats.get('mean_nodes', 0.0)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    available = bundled_corpora()
+    parser = argparse.ArgumentParser(description='Benchmark the sudoku solver.')
+    parser.add_argument('--corpus', action='append', choices=list(available),
+                        help='corpus to run, may be repeated (default: all)')
+    parser.add_argument('--file', action='append', default=[], help='extra corpus file, may be repeated')
+    parser.add_argument('--target', action='append', choices=list(targets),
+                        help='target to time, may be repeated (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per puzzle, the fastest counts')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, as a fraction')
+    parser.add_argument('--metric', default='p50_ms', choices=('mean_ms', 'p50_ms', 'p99_ms'),
+                        help='statistic compared with the baseline')
+    args = parser.parse_args(argv)
+
+    corpora = [available[name] for name in args.corpus or available]
+    corpora += [load_corpus(path) for path in args.file]
+    results = run(corpora, args.target or list(targets), args.repeat)
+    print(report(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.metric)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
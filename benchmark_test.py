@@ -0,0 +1,40 @@
+import copy
+import unittest
+
+import benchmark
+import solution
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_bundled_corpora(self):
+        corpora = benchmark.bundled_corpora()
+        self.assertEqual(sorted(corpora), ['diagonal', 'easy', 'hard', 'hardest17', 'unsolvable'])
+        self.assertTrue(corpora['diagonal'].diagonal)
+        self.assertFalse(corpora['hard'].diagonal)
+        for grid in corpora['hardest17'].grids:
+            self.assertEqual(81 - grid.count('.'), 17)
+        for grid in corpora['unsolvable'].grids:
+            self.assertFalse(solution.solve(grid, diagonal=False))
+        for grid in corpora['diagonal'].grids[:5]:
+            self.assertTrue(solution.solve(grid, diagonal=True))
+
+    def test_run_and_compare(self):
+        corpus = benchmark.bundled_corpora()['easy']
+        corpus = corpus._replace(grids=corpus.grids[:3])
+        results = benchmark.run([corpus], list(benchmark.targets), repeat=1)
+        stats = results['results']['easy']['solve']
+        self.assertEqual(stats['count'], 3)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertIn('naked_twins', results['results']['easy'])
+
+        self.assertEqual(benchmark.compare(results, results, threshold=0.0), [])
+        slower = copy.deepcopy(results)
+        slower['results']['easy']['solve']['p50_ms'] *= 2
+        regressions = benchmark.compare(slower, results, threshold=0.5)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('easy/solve', regressions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,601 @@
+"""
+Bitmask candidate engine for the Sudoku solver.
+
+A board is a flat list of integers, one per box in the order of `geometry.boxes`.
+Bit i of a cell is set while the i-th digit is still a candidate, so '123456789'
+becomes 0b111111111 and a solved box has exactly one bit set. Removing candidates is a
+single `&=` instead of building a new string. Every function takes the variants.Geometry
+of the board, which supplies the unit tables and the mask tables for its size.
+"""
+import time
+
+DIGITS = '123456789'
+ALL_DIGITS = (1 << len(DIGITS)) - 1
+
+# Lookup tables indexed by candidate mask, for the standard 9 x 9 boards
+POPCOUNT = [bin(mask).count('1') for mask in range(ALL_DIGITS + 1)]
+DIGIT_MASKS = dict((d, 1 << i) for i, d in enumerate(DIGITS))
+
+
+def to_mask(digits, geometry=None):
+    """The candidate mask of a string of digits, e.g. '137' -> 0b1000101."""
+    digit_masks = DIGIT_MASKS if geometry is None else geometry.digit_masks
+    mask = 0
+    for digit in digits:
+        mask |= digit_masks[digit]
+    return mask
+
+
+def from_values(values, geometry):
+    """
+    Convert a sudoku in dictionary form into a board of candidate masks.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        geometry(Geometry): the box order to use
+    Returns:
+        the board as a list of masks
+    """
+
+    return [to_mask(values[box], geometry) for box in geometry.boxes]
+
+
+def to_values(board, geometry):
+    """
+    Convert a board of candidate masks back into dictionary form.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): the box order used by the board
+    Returns:
+        a dictionary of the form {'box_name': '123456789', ...}
+    """
+
+    mask_digits = geometry.mask_digits
+    return dict((box, mask_digits[mask]) for box, mask in zip(geometry.boxes, board))
+
+
+def naked_twins(board, geometry):
+    """
+    Eliminate values using the naked twins strategy.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): unit and peer tables
+    Returns:
+        the board with the naked twins eliminated from peers.
+    """
+
+    peers = geometry.peers
+    shared_units = geometry.shared_units
+    popcount = geometry.popcount
+    for dual_cell, twins in enumerate(board):
+        if popcount[twins] != 2:
+            continue
+        for second_cell in peers[dual_cell]:
+            if board[second_cell] != twins:
+                continue
+            for unit in shared_units[dual_cell][second_cell]:
+                for cell in unit:
+                    if cell != dual_cell and cell != second_cell and popcount[board[cell]] > 1:
+                        board[cell] &= ~twins
+    return board
+
+
+def eliminate(board, geometry):
+    """
+    Eliminate values from peers of each cell with a single value.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): unit and peer tables
+    Returns:
+        the board with eliminated values from peers.
+    """
+
+    peers = geometry.peers
+    popcount = geometry.popcount
+    for cell, mask in enumerate(board):
+        if popcount[mask] == 1:
+            for peer in peers[cell]:
+                board[peer] &= ~mask
+    return board
+
+
+def only_choice(board, geometry):
+    """
+    Finalize all values that are the only choice for a unit.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): unit and peer tables
+    Returns:
+        the board after filling in only choices. False if a unit cannot hold every digit.
+    """
+
+    popcount = geometry.popcount
+    all_digits = geometry.all_digits
+    for unit in geometry.unitlist:
+        seen_once = 0
+        seen_twice = 0
+        for cell in unit:
+            mask = board[cell]
+            seen_twice |= seen_once & mask
+            seen_once |= mask
+        if seen_once != all_digits:
+            return False
+        only = seen_once & ~seen_twice
+        if only:
+            for cell in unit:
+                mask = board[cell] & only
+                if mask:
+                    # two digits that can only go in the same cell cannot both be placed
+                    if popcount[mask] > 1:
+                        return False
+                    board[cell] = mask
+    return board
+
+
+class BudgetExhausted(Exception):
+    """Raised by Budget when a solve runs out of time or search nodes. args[0] is 'deadline' or 'nodes'."""
+
+
+class Budget:
+    """
+    Time and node limits of one solve, checked from the propagation and search loops.
+    Counting a node is a subtraction; the clock is only read every `interval` checks.
+    Args:
+        seconds(float): time allowed from now. None for no limit.
+        max_nodes(int): search nodes allowed. None for no limit.
+        interval(int): checks between two readings of the clock
+    Attributes:
+        nodes(int): search nodes used so far
+        reduced(list): a copy of the board once the search has propagated it at the root,
+            i.e. with every deduction made before the first guess
+    """
+
+    def __init__(self, seconds=None, max_nodes=None, interval=64):
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        self.max_nodes = max_nodes
+        self.interval = interval
+        self.countdown = interval
+        self.nodes = 0
+        self.reduced = None
+
+    def tick(self):
+        """Check the clock every `interval` calls."""
+        self.countdown -= 1
+        if not self.countdown:
+            self.countdown = self.interval
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise BudgetExhausted('deadline')
+
+    def node(self):
+        """Count a search node."""
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExhausted('nodes')
+        self.tick()
+
+
+def propagate(board, geometry, cells=None, state=None, stats=None, strategies=(), budget=None):
+    """
+    Worklist-driven constraint propagation.
+    Only the peers and units touched by a change are re-examined: a cell that becomes
+    solved is eliminated from its peers, and every unit containing a changed cell is
+    queued for only_choice and naked_twins. When the worklist runs dry, the extra
+    strategies are tried from the first, and the removals of the first one that finds
+    any go back on the worklist, so an expensive strategy only runs once every cheaper
+    one has stalled. Stops at the first contradiction.
+    Args:
+        board(list): candidate masks, modified in place
+        geometry(Geometry): unit and peer tables
+        cells(iterable): cells changed since the board was last propagated. Default: all cells.
+        state(SearchState): if given, every change goes through state.set() so it can be undone
+        stats(instrumentation.SolveStats): if given, counts and times each strategy
+        strategies(tuple): further strategies from deduction.py, cheapest first
+        budget(Budget): if given, checked for every unit taken off the worklist
+    Returns:
+        the reduced board. False if a cell or unit ran out of candidates.
+    Raises:
+        BudgetExhausted: when the budget runs out. The board keeps the removals made so far.
+    """
+
+    if stats is None:
+        return _propagate(board, geometry, cells, state, None, strategies, budget)
+    stats.propagations += 1
+    try:
+        return _propagate(board, geometry, cells, state, stats, strategies, budget)
+    finally:
+        stats.switch(None)
+
+
+def _propagate(board, geometry, cells, state, stats, strategies, budget):
+    peers = geometry.peers
+    unitlist = geometry.unitlist
+    cell_units = geometry.cell_units
+    popcount = geometry.popcount
+    all_digits = geometry.all_digits
+    if cells is None:
+        cells = range(len(board))
+
+    singles = []
+    queued = set()
+    pending = []
+
+    def touched(cell, mask):
+        if popcount[mask] == 1:
+            singles.append(cell)
+        for u in cell_units[cell]:
+            if u not in queued:
+                queued.add(u)
+                pending.append(u)
+
+    if state is None:
+        def changed(cell, mask):
+            board[cell] = mask
+            touched(cell, mask)
+    elif state.recorder is None:
+        trail = state.trail
+
+        # state.set() without the method call, for the search's hot path
+        def changed(cell, mask):
+            trail.append(cell)
+            trail.append(board[cell])
+            board[cell] = mask
+            touched(cell, mask)
+    else:
+        def changed(cell, mask):
+            state.set(cell, mask)
+            touched(cell, mask)
+
+    if stats is not None:
+        apply_change = changed
+
+        def changed(cell, mask):
+            stats.removed[stats.current] += popcount[board[cell]] - popcount[mask]
+            apply_change(cell, mask)
+
+    for cell in cells:
+        if board[cell] == 0:
+            return False
+        touched(cell, board[cell])
+
+    while True:
+        while singles or pending:
+            # eliminate
+            if stats is not None:
+                stats.switch('eliminate')
+            while singles:
+                cell = singles.pop()
+                mask = board[cell]
+                for peer in peers[cell]:
+                    peer_mask = board[peer]
+                    if peer_mask & mask:
+                        peer_mask &= ~mask
+                        if not peer_mask:
+                            return False
+                        changed(peer, peer_mask)
+
+            if not pending:
+                break
+            if budget is not None:
+                budget.tick()
+            u = pending.pop()
+            queued.discard(u)
+            unit = unitlist[u]
+
+            # only_choice
+            if stats is not None:
+                stats.unit_visits += 1
+                stats.switch('only_choice')
+            seen_once = 0
+            seen_twice = 0
+            for cell in unit:
+                mask = board[cell]
+                seen_twice |= seen_once & mask
+                seen_once |= mask
+            if seen_once != all_digits:
+                return False
+            only = seen_once & ~seen_twice
+            if only:
+                for cell in unit:
+                    mask = board[cell]
+                    if mask & only and popcount[mask] > 1:
+                        mask &= only
+                        if popcount[mask] > 1:
+                            return False
+                        changed(cell, mask)
+
+            # naked_twins
+            if stats is not None:
+                stats.switch('naked_twins')
+            duals = {}
+            for cell in unit:
+                twins = board[cell]
+                if popcount[twins] != 2:
+                    continue
+                if twins not in duals:
+                    duals[twins] = cell
+                    continue
+                second_cell = duals[twins]
+                for other in unit:
+                    mask = board[other]
+                    if other != cell and other != second_cell and mask & twins:
+                        mask &= ~twins
+                        if not mask:
+                            return False
+                        changed(other, mask)
+
+        # the worklist has stalled: escalate to the first strategy that finds something
+        for strategy in strategies:
+            if budget is not None:
+                budget.tick()
+            if stats is not None:
+                stats.switch(strategy.__name__)
+            removals = strategy(board, geometry)
+            if removals:
+                break
+        else:
+            return board
+        for cell, digits in removals:
+            mask = board[cell]
+            if mask & digits:
+                mask &= ~digits
+                if not mask:
+                    return False
+                changed(cell, mask)
+
+
+def reduce_puzzle(board, geometry, strategies=()):
+    """
+    Executes eliminate, only_choice and naked_twins until no further reduction possible.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): unit and peer tables
+        strategies(tuple): further strategies from deduction.py, tried when those stall
+    Returns:
+        the reduced board. False if a cell has no candidates left.
+    """
+
+    return propagate(board, geometry, None, None, None, strategies)
+
+
+def search(board, geometry, changed=None, stats=None, depth=0, strategies=(), budget=None):
+    """
+    Recursive call of propagate and DFS trial and error. Copies the board at every branch.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): unit and peer tables
+        changed(list): cells assigned since the board was last propagated. Default: all cells.
+        stats(instrumentation.SolveStats): if given, collects counters and fires its hooks
+        depth(int): number of branches above this call
+        strategies(tuple): further strategies for propagate()
+        budget(Budget): if given, limits the search
+    Returns:
+        the solved board. False if no solution could be found
+    Raises:
+        BudgetExhausted: when the budget runs out
+    """
+
+    if stats is None:
+        board = propagate(board, geometry, changed, None, None, strategies, budget)
+    else:
+        begin = time.perf_counter()
+        board = propagate(board, geometry, changed, None, stats, strategies, budget)
+        if board is False:
+            stats.contradiction(depth, time.perf_counter() - begin)
+    if board is False:
+        return False
+    if budget is not None and not depth:
+        budget.reduced = board[:]
+    popcount = geometry.popcount
+    best = None
+    best_count = geometry.size + 1
+    for cell, mask in enumerate(board):
+        count = popcount[mask]
+        if 1 < count < best_count:
+            best, best_count = cell, count
+    if best is None:
+        return board
+    if stats is not None:
+        stats.branch(depth + 1, best, best_count)
+    candidates = board[best]
+    while candidates:
+        digit = candidates & -candidates
+        candidates ^= digit
+        new_board = board[:]
+        new_board[best] = digit
+        if budget is not None:
+            budget.node()
+        if stats is not None:
+            stats.node(depth + 1, best, digit)
+        attempt = search(new_board, geometry, [best], stats, depth + 1, strategies, budget)
+        if attempt:
+            return attempt
+    if stats is not None:
+        stats.backtrack(depth + 1)
+    return False
+
+
+class SearchState:
+    """
+    Undo trail for a board searched in place.
+    Every change goes through set(), which records the previous mask on the trail, and
+    rollback() restores them. The branching cell is found by a scan of the board once per
+    branch, which is cheaper than keeping an index of cells by candidate count up to date
+    on every removal.
+    Args:
+        board(list): candidate masks
+        geometry(Geometry): the board's geometry
+        recorder(recording.AssignmentRecorder): if given, notified of every change and undo
+    """
+
+    def __init__(self, board, geometry, recorder=None):
+        self.board = board
+        self.recorder = recorder
+        self.popcount = geometry.popcount
+        self.size = geometry.size
+        # flat cell, previous mask pairs
+        self.trail = []
+
+    def set(self, cell, mask):
+        board = self.board
+        self.trail.append(cell)
+        self.trail.append(board[cell])
+        if self.recorder is not None:
+            self.recorder.record(cell, board[cell], mask)
+        board[cell] = mask
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def rollback(self, mark):
+        """Undo every change made after checkpoint `mark`."""
+        board = self.board
+        trail = self.trail
+        recorder = self.recorder
+        while len(trail) > mark:
+            mask = trail.pop()
+            cell = trail.pop()
+            if recorder is not None:
+                recorder.record(cell, board[cell], mask)
+            board[cell] = mask
+
+    def most_constrained(self):
+        """Unsolved cells with the fewest candidates, in cell order. None if every cell is solved."""
+        popcount = self.popcount
+        best_count = self.size + 1
+        cells = None
+        for cell, mask in enumerate(self.board):
+            count = popcount[mask]
+            if 1 < count <= best_count:
+                if count < best_count:
+                    best_count = count
+                    cells = [cell]
+                else:
+                    cells.append(cell)
+        return cells
+
+
+# Tie-breaking heuristics: pick a branching cell among equally constrained cells
+
+def first_cell(board, geometry, cells):
+    """The lowest-numbered cell, as in the copying search."""
+    return cells[0]
+
+
+def max_degree(board, geometry, cells):
+    """The cell with the most unsolved peers, which constrains the rest of the board most."""
+    popcount = geometry.popcount
+    return max(cells, key=lambda cell: (sum(1 for peer in geometry.peers[cell] if popcount[board[peer]] > 1),
+                                        -cell))
+
+
+# Value-ordering heuristics: order the candidates of the branching cell
+
+def ascending(board, geometry, cell):
+    """Candidate digits as masks, lowest digit first."""
+    candidates = board[cell]
+    digits = []
+    while candidates:
+        digit = candidates & -candidates
+        candidates ^= digit
+        digits.append(digit)
+    return digits
+
+
+def least_constraining(board, geometry, cell):
+    """Candidate digits as masks, the one ruled out of the fewest peers first."""
+    peers = geometry.peers[cell]
+    return sorted(ascending(board, geometry, cell),
+                  key=lambda digit: sum(1 for peer in peers if board[peer] & digit))
+
+
+tie_breakers = {'first': first_cell, 'degree': max_degree}
+value_orders = {'ascending': ascending, 'lcv': least_constraining}
+
+
+def search_in_place(board, geometry, tie_break=first_cell, value_order=ascending, recorder=None,
+                    stats=None, strategies=(), budget=None):
+    """
+    Iterative DFS that mutates a single board.
+    Every candidate removal is recorded on an undo trail, and a failed branch is rolled
+    back to the checkpoint taken before it, so no board is copied and the depth of the
+    search is not bounded by the recursion limit.
+    Args:
+        board(list): candidate masks, modified in place
+        geometry(Geometry): unit and peer tables
+        tie_break(function): picks the branching cell among the most constrained cells
+        value_order(function): returns the candidates of the branching cell in the order to try
+        recorder(recording.AssignmentRecorder): if given, records every change, undos included
+        stats(instrumentation.SolveStats): if given, collects counters and fires its hooks
+        strategies(tuple): further strategies for propagate()
+        budget(Budget): if given, limits the search
+    Returns:
+        the solved board. False if no solution could be found
+    Raises:
+        BudgetExhausted: when the budget runs out
+    """
+
+    for solved in iter_in_place(board, geometry, tie_break, value_order, recorder, stats, strategies, budget):
+        return solved
+    return False
+
+
+def iter_in_place(board, geometry, tie_break=first_cell, value_order=ascending, recorder=None,
+                  stats=None, strategies=(), budget=None):
+    """
+    Enumerate the solutions of a board with the in-place search of search_in_place().
+    After a solution the search carries on from the last branch, so the propagation
+    done above it is shared instead of repeated from the root.
+    Args:
+        as for search_in_place()
+    Returns:
+        an iterator over the solutions. Each one is `board` itself, which changes again
+        when the iterator resumes; copy it to keep it.
+    """
+
+    begin = time.perf_counter() if stats is not None else 0.0
+    if recorder is None:
+        # the initial propagation is never undone, so it is not put on the trail
+        ok = propagate(board, geometry, None, None, stats, strategies, budget) is not False
+        state = SearchState(board, geometry)
+    else:
+        state = SearchState(board, geometry, recorder)
+        ok = propagate(board, geometry, None, state, stats, strategies, budget) is not False
+    if not ok and stats is not None:
+        stats.contradiction(0, time.perf_counter() - begin)
+    if ok and budget is not None:
+        budget.reduced = board[:]
+    # one frame per open branch: (cell, untried candidates in reverse order, checkpoint)
+    frames = []
+    while True:
+        if ok:
+            cells = state.most_constrained()
+            if cells is None:
+                yield board
+            else:
+                cell = tie_break(board, geometry, cells)
+                frames.append((cell, value_order(board, geometry, cell)[::-1], state.checkpoint()))
+                if stats is not None:
+                    stats.branch(len(frames), cell, geometry.popcount[board[cell]])
+
+        # backtrack to the innermost branch with an untried candidate
+        while frames:
+            cell, digits, mark = frames[-1]
+            state.rollback(mark)
+            if digits:
+                digit = digits.pop()
+                if budget is not None:
+                    budget.node()
+                state.set(cell, digit)
+                if stats is None:
+                    ok = propagate(board, geometry, [cell], state, None, strategies, budget) is not False
+                else:
+                    stats.node(len(frames), cell, digit)
+                    begin = time.perf_counter()
+                    ok = propagate(board, geometry, [cell], state, stats, strategies, budget) is not False
+                    if not ok:
+                        stats.contradiction(len(frames), time.perf_counter() - begin)
+                break
+            frames.pop()
+            if stats is not None:
+                stats.backtrack(len(frames) + 1)
+        else:
+            return
@@ -0,0 +1,165 @@
+import bitboard
+import solution
+import solution_test
+import unittest
+
+
+class TestBitboard(unittest.TestCase):
+    diagonal_grids = ['2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3',
+                      '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................']
+
+    def test_round_trip(self):
+        values = solution.grid_values(self.diagonal_grids[0])
+        board = bitboard.from_values(values, solution.geometry)
+        self.assertEqual(board[0], 0b10)
+        self.assertEqual(board[1], bitboard.ALL_DIGITS)
+        self.assertEqual(bitboard.to_values(board, solution.geometry), values)
+
+    def test_geometry_tables(self):
+        geometry = solution.geometry
+        a1, a2, b2, i9 = (geometry.index[box] for box in ('A1', 'A2', 'B2', 'I9'))
+        self.assertEqual(len(geometry.peers[a1]), len(solution.peers['A1']))
+        self.assertEqual(len(geometry.shared_units[a1][a2]), 2)
+        self.assertEqual(len(geometry.shared_units[a1][b2]), 2)
+        self.assertEqual(len(geometry.shared_units[a1][i9]), 1)
+        self.assertEqual(geometry.shared_units[a2][i9], ())
+
+    def test_eliminate(self):
+        values = solution.grid_values(self.diagonal_grids[0])
+        expected = solution.eliminate(dict(values))
+        board = bitboard.eliminate(bitboard.from_values(values, solution.geometry), solution.geometry)
+        self.assertEqual(bitboard.to_values(board, solution.geometry), expected)
+
+    def test_naked_twins(self):
+        fixtures = solution_test.TestNakedTwins
+        for before, possible_solutions in ((fixtures.before_naked_twins_1, fixtures.possible_solutions_1),
+                                           (fixtures.before_naked_twins_2, fixtures.possible_solutions_2)):
+            board = bitboard.naked_twins(bitboard.from_values(before, solution.geometry), solution.geometry)
+            self.assertIn(bitboard.to_values(board, solution.geometry), possible_solutions)
+
+    def test_propagate(self):
+        geometry = solution.geometry
+        board = bitboard.from_values(solution.grid_values(self.diagonal_grids[0]), geometry)
+        board = bitboard.propagate(board, geometry)
+        self.assertTrue(all(bitboard.POPCOUNT[mask] == 1 for mask in board))
+        self.assertEqual(bitboard.to_values(board, geometry), solution.solve(self.diagonal_grids[0]))
+
+    def test_propagate_contradiction(self):
+        geometry = solution.geometry
+        board = bitboard.from_values(solution.grid_values(self.diagonal_grids[0]), geometry)
+        bitboard.propagate(board, geometry)
+        a2 = geometry.index['A2']
+        board[a2] = board[geometry.index['A1']]
+        self.assertFalse(bitboard.propagate(board, geometry, [a2]))
+
+    def test_search_matches_dict_search(self):
+        for grid in self.diagonal_grids:
+            expected = solution.search(solution.grid_values(grid))
+            self.assertEqual(solution.solve(grid), expected)
+
+    def test_search_modes_agree(self):
+        for grid in self.diagonal_grids + ['.' * 81]:
+            self.assertEqual(solution.solve(grid, 'trail'), solution.solve(grid, 'copy'))
+
+    def test_rollback(self):
+        geometry = solution.geometry
+        board = bitboard.from_values(solution.grid_values(self.diagonal_grids[1]), geometry)
+        bitboard.propagate(board, geometry)
+        before = board[:]
+        state = bitboard.SearchState(board, geometry)
+        branching = state.most_constrained()
+        cell = board.index(max(board, key=lambda mask: bitboard.POPCOUNT[mask]))
+        state.set(cell, board[cell] & -board[cell])
+        bitboard.propagate(board, geometry, [cell], state)
+        self.assertNotEqual(board, before)
+        state.rollback(0)
+        self.assertEqual(board, before)
+        self.assertEqual(state.most_constrained(), branching)
+        popcount = geometry.popcount
+        fewest = min(popcount[mask] for mask in board if popcount[mask] > 1)
+        self.assertEqual(branching, [cell for cell, mask in enumerate(board) if popcount[mask] == fewest])
+
+    def test_heuristics(self):
+        grid = self.diagonal_grids[1]
+        for tie_break in bitboard.tie_breakers:
+            for value_order in bitboard.value_orders:
+                values = solution.solve(grid, tie_break=tie_break, value_order=value_order)
+                for unit in solution.unitlist:
+                    self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+                for box, char in zip(solution.boxes, grid):
+                    if char != '.':
+                        self.assertEqual(values[box], char)
+
+    def test_unsolvable(self):
+        # two 1s in the first row
+        self.assertFalse(solution.solve('11' + '.' * 79))
+
+
+class TestEnumeration(unittest.TestCase):
+    hard_grid = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    def test_iter_solutions(self):
+        # a solved grid with a deadly rectangle left open: its two digits can go either way round
+        grid = '4.7.698256.2.58947958724316825437169791586432346912758289643571573291684164875293'
+        first, second = solutions = list(solution.iter_solutions(grid, diagonal=False))
+        self.assertNotEqual(first, second)
+        for values in solutions:
+            for unit in solution.classic_geometry.unit_boxes:
+                self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+        self.assertEqual(solution.count_solutions(grid, limit=None, diagonal=False), 2)
+        self.assertEqual(solution.classify(grid, diagonal=False), 'multiple')
+        self.assertEqual(list(solution.iter_solutions(self.hard_grid, diagonal=False)),
+                         [solution.solve(self.hard_grid, diagonal=False)])
+
+    def test_count_solutions_limit(self):
+        self.assertEqual(solution.count_solutions('.' * 81, limit=50), 50)
+        self.assertEqual(solution.count_solutions(self.unsolvable_grid, diagonal=False), 0)
+
+    def test_classify(self):
+        self.assertEqual(solution.classify(self.hard_grid, diagonal=False), 'unique')
+        self.assertEqual(solution.classify('.' * 81), 'multiple')
+        self.assertEqual(solution.classify(self.unsolvable_grid, diagonal=False), 'none')
+
+
+class TestBudget(unittest.TestCase):
+    # needs 144 search nodes with the bitboard engine, 85 with dlx
+    hard_grid = '1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.8...2.....1'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    def test_within_budget(self):
+        outcome = solution.solve(self.hard_grid, diagonal=False, max_nodes=10000, deadline=60)
+        self.assertEqual(outcome.status, 'solved')
+        self.assertEqual(outcome.values, solution.solve(self.hard_grid, diagonal=False))
+        self.assertIsNone(outcome.reason)
+        self.assertGreater(outcome.nodes, 0)
+        outcome = solution.solve(self.unsolvable_grid, diagonal=False, max_nodes=10000)
+        self.assertEqual((outcome.status, outcome.values), ('unsolvable', False))
+
+    def test_max_nodes(self):
+        answer = solution.solve(self.hard_grid, diagonal=False)
+        reduced = solution.reduce_puzzle(solution.grid_values(self.hard_grid, solution.classic_geometry),
+                                         variant=solution.classic_geometry)
+        for options in ({'search_mode': 'trail'}, {'search_mode': 'copy'}, {'engine': 'dlx'}):
+            outcome = solution.solve(self.hard_grid, diagonal=False, max_nodes=5, **options)
+            self.assertEqual((outcome.status, outcome.reason, outcome.nodes), ('exhausted', 'nodes', 6))
+            # the partial board only holds deductions, which the solution agrees with
+            for box, digits in outcome.values.items():
+                self.assertIn(answer[box], digits)
+                self.assertLessEqual(len(digits), len(reduced[box]))
+
+    def test_deadline(self):
+        outcome = solution.solve('.' * 81, diagonal=False, deadline=0)
+        self.assertEqual((outcome.status, outcome.reason), ('exhausted', 'deadline'))
+        self.assertEqual(len(outcome.values), 81)
+
+    def test_budget(self):
+        budget = bitboard.Budget(max_nodes=2, interval=1)
+        budget.node()
+        budget.node()
+        self.assertRaises(bitboard.BudgetExhausted, budget.node)
+        self.assertRaises(bitboard.BudgetExhausted, bitboard.Budget(seconds=-1, interval=1).tick)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,328 @@
+"""
+Canonical-form solution cache.
+
+Grids that differ only by a symmetry of the puzzle share one cache entry. A grid is
+mapped to a canonical form by a transform (a permutation of the cells plus a relabeling
+of the digits); the stored solution of the canonical form is mapped back through the
+inverse transform.
+
+Classic rules: rows are sorted within bands and bands are sorted by clue-count
+signatures, columns and stacks likewise, the grid is tried both as is and transposed,
+and digits are relabeled in order of first appearance; the smallest resulting grid is
+the canonical form. Rows or columns whose signatures tie are tried in every order, up
+to MAX_TIES candidates. Past that some equivalent grids get different keys, which only
+costs a cache miss.
+
+Diagonal rules: the grid may only be moved by transforms that keep both diagonals as
+units. These are the eight rotations and reflections of the square, combined with the
+line permutations that are symmetric about the middle line and applied to the rows and
+the columns alike: swapping the outer bands, permuting the lines of the first band while
+mirroring that on the last band, and swapping the outer lines of the middle band. The
+canonical form is the smallest relabeled grid over all of them, so every grid that one
+of them maps onto another gets the same key.
+"""
+import collections
+import itertools
+import shelve
+
+import solution
+
+SIZE = 9
+BAND = 3
+# most candidate transforms tried per orientation when signatures tie
+MAX_TIES = 64
+
+
+def _relabel(grid, perm):
+    """
+    Apply a cell permutation and relabel the digits by first appearance.
+    Returns:
+        (canonical grid, {original digit: canonical digit})
+    """
+    labels = {}
+    chars = []
+    for cell in perm:
+        char = grid[cell]
+        if char == '.':
+            chars.append('.')
+            continue
+        if char not in labels:
+            labels[char] = str(len(labels) + 1)
+        chars.append(labels[char])
+    return ''.join(chars), labels
+
+
+def _line_orders(signature):
+    """
+    Orderings of 9 lines (rows or columns) by band-aware signatures: the lines within
+    each band, then the bands, in decreasing order. Lines or bands whose signatures tie
+    can't be told apart, so every ordering of them is a candidate, up to MAX_TIES.
+    """
+    bands = []
+    for band in range(BAND):
+        members = sorted(range(band * BAND, band * BAND + BAND), key=lambda line: signature[line], reverse=True)
+        bands.append(_tied_orders(members, lambda line: signature[line]))
+    band_signature = lambda band: sorted((signature[line] for line in range(band * BAND, band * BAND + BAND)),
+                                         reverse=True)
+    band_orders = _tied_orders(sorted(range(BAND), key=band_signature, reverse=True), band_signature)
+    orders = []
+    for band_order in band_orders:
+        for choice in itertools.product(*(bands[band] for band in band_order)):
+            orders.append([line for members in choice for line in members])
+            if len(orders) >= MAX_TIES:
+                return orders
+    return orders
+
+
+def _tied_orders(ordered, key):
+    """All reorderings of a sorted list that permute only runs of equal keys."""
+    runs = [list(group) for _, group in itertools.groupby(ordered, key)]
+    orders = []
+    for choice in itertools.product(*(itertools.permutations(run) for run in runs)):
+        orders.append([item for run in choice for item in run])
+        if len(orders) >= MAX_TIES:
+            break
+    return orders
+
+
+def _classic_perms(grid):
+    """Candidate canonicalizing permutations for classic rules."""
+    clue = [char != '.' for char in grid]
+    for transposed in (False, True):
+        def at(r, c):
+            return c * SIZE + r if transposed else r * SIZE + c
+        # a line's signature starts with its clue counts per box, in sorted order, which
+        # does not change when the lines across it are permuted
+        row_signature = []
+        for r in range(SIZE):
+            per_stack = [sum(clue[at(r, c)] for c in range(s * BAND, s * BAND + BAND)) for s in range(BAND)]
+            row_signature.append((sum(per_stack), sorted(per_stack)))
+        col_signature = []
+        for c in range(SIZE):
+            per_band = [sum(clue[at(r, c)] for r in range(b * BAND, b * BAND + BAND)) for b in range(BAND)]
+            col_signature.append((sum(per_band), sorted(per_band)))
+        # refine once: add the signatures of the crossing lines through the clues, per box
+        rows_refined = [(row_signature[r], sorted(sorted(col_signature[c] for c in range(s * BAND, s * BAND + BAND)
+                                                         if clue[at(r, c)]) for s in range(BAND)))
+                        for r in range(SIZE)]
+        cols_refined = [(col_signature[c], sorted(sorted(row_signature[r] for r in range(b * BAND, b * BAND + BAND)
+                                                         if clue[at(r, c)]) for b in range(BAND)))
+                        for c in range(SIZE)]
+        row_orders = _line_orders(rows_refined)
+        col_orders = _line_orders(cols_refined)
+        count = 0
+        for rows in row_orders:
+            for cols in col_orders:
+                yield [at(r, c) for r in rows for c in cols]
+                count += 1
+                if count >= MAX_TIES:
+                    break
+            if count >= MAX_TIES:
+                break
+
+
+def _mirrored_line_perms():
+    """Line permutations that keep the bands and commute with reversing the lines."""
+    last = SIZE - 1
+    perms = []
+    middle = BAND * (BAND // 2)
+    for top in (0, BAND * (BAND - 1)):
+        for first in itertools.permutations(range(BAND)):
+            for centre in (list(range(middle, middle + BAND)), list(range(middle + BAND - 1, middle - 1, -1))):
+                lines = [top + i for i in first]
+                perms.append(lines + centre + [last - line for line in reversed(lines)])
+    return perms
+
+
+def _build_diagonal_perms():
+    last = SIZE - 1
+    maps = [lambda r, c: (r, c), lambda r, c: (c, last - r), lambda r, c: (last - r, last - c),
+            lambda r, c: (last - c, r), lambda r, c: (c, r), lambda r, c: (last - c, last - r),
+            lambda r, c: (r, last - c), lambda r, c: (last - r, c)]
+    perms = set()
+    for lines in _mirrored_line_perms():
+        for transform in maps:
+            perm = []
+            for r in range(SIZE):
+                for c in range(SIZE):
+                    source_r, source_c = transform(lines[r], lines[c])
+                    perm.append(source_r * SIZE + source_c)
+            perms.add(tuple(perm))
+    return sorted(perms)
+
+
+# cell permutations that keep rows, columns, boxes and both diagonals as units
+DIAGONAL_PERMS = _build_diagonal_perms()
+
+
+def _diagonal_perms(grid):
+    """Candidate canonicalizing permutations for diagonal rules: all of DIAGONAL_PERMS."""
+    return DIAGONAL_PERMS
+
+
+def canonical_form(grid, diagonal=False):
+    """
+    Map a grid to its canonical form.
+    Args:
+        grid(string): a sudoku grid, '.' or '0' for empty boxes
+        diagonal(bool): only use symmetries that keep the diagonal units intact
+    Returns:
+        (canonical grid, permutation, labels): canonical cell i holds original cell perm[i],
+        with original digit d written as labels[d]
+    """
+
+    grid = grid.replace('0', '.')
+    if len(grid) != SIZE * SIZE:
+        raise ValueError('expected {} boxes, got {}'.format(SIZE * SIZE, len(grid)))
+    perms = _diagonal_perms(grid) if diagonal else _classic_perms(grid)
+    best = None
+    for perm in perms:
+        canonical, labels = _relabel(grid, perm)
+        if best is None or canonical < best[0]:
+            best = (canonical, perm, labels)
+    return best
+
+
+def _digit_map(labels):
+    """The inverse of a relabeling: {canonical digit: original digit} for all nine digits."""
+    digits = dict((canonical, original) for original, canonical in labels.items())
+    # digits that did not appear among the clues are relabeled among themselves
+    unused_canonical = [d for d in solution.cols if d not in digits]
+    unused_original = [d for d in solution.cols if d not in labels]
+    digits.update(zip(unused_canonical, unused_original))
+    return digits
+
+
+def restore(canonical_solution, perm, labels):
+    """
+    Map a solution of the canonical form back to the original grid.
+    Args:
+        canonical_solution(string): 81 digits
+        perm(list), labels(dict): as returned by canonical_form()
+    Returns:
+        the solution of the original grid as 81 digits
+    """
+
+    digits = _digit_map(labels)
+    chars = [None] * len(perm)
+    for cell, char in zip(perm, canonical_solution):
+        chars[cell] = digits[char]
+    return ''.join(chars)
+
+
+def restore_values(canonical_values, perm, labels):
+    """
+    Map a board of the canonical form in dictionary form, possibly unsolved, back to the
+    original grid.
+    Args:
+        canonical_values(dict): the candidates of every box of the canonical form
+        perm(list), labels(dict): as returned by canonical_form()
+    Returns:
+        the board of the original grid in dictionary form
+    """
+
+    digits = _digit_map(labels)
+    values = {}
+    for cell, box in zip(perm, solution.boxes):
+        values[solution.boxes[cell]] = ''.join(sorted(digits[d] for d in canonical_values[box]))
+    return values
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions keyed by canonical form, with an optional on-disk store. A grid
+    seen before is found by its own text first, without canonicalizing it.
+    Args:
+        maxsize(int): entries kept in memory, for canonical forms and for grids alike
+        path(string): if given, a shelve database that keeps every solution across runs
+    """
+
+    def __init__(self, maxsize=10000, path=None):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        # {raw grid key: solution of that grid}, checked before the grid is canonicalized
+        self.grids = collections.OrderedDict()
+        self.store = shelve.open(path) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _lookup(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.store is not None and key in self.store:
+            answer = self.store[key]
+            self._remember(self.entries, key, answer)
+            return answer
+        return None
+
+    def _remember(self, entries, key, answer):
+        entries[key] = answer
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def solve(self, grid, diagonal=None, variant=None, **options):
+        """
+        Solve a grid through the cache.
+        Args:
+            grid(string): a sudoku grid
+            diagonal(bool): whether the diagonals are units too. Default: solution.DIAGONAL.
+            variant: only the 9 x 9 'classic' and 'diagonal' variants are supported, since the
+                symmetries used here would break windoku windows and jigsaw regions
+            options: further arguments for solution.solve() on a miss
+        Returns:
+            like solution.solve(): the solution in dictionary form, or False. With a deadline
+            or max_nodes, an Outcome; one whose budget ran out is not cached.
+        Raises:
+            ValueError: for any other variant
+        """
+
+        rules = solution.get_variant(variant, diagonal)
+        if rules is not solution.classic_geometry and rules is not solution.diagonal_geometry:
+            raise ValueError('SolutionCache only supports 9 x 9 classic and diagonal rules, not {!r}'.format(rules))
+        diagonal = rules is solution.diagonal_geometry
+        budgeted = options.get('deadline') is not None or options.get('max_nodes') is not None
+        # the empty string stands for "no solution"
+        raw = ('d:' if diagonal else 's:') + grid
+        answer = self.grids.get(raw)
+        if answer is not None:
+            # the same grid again: no need to canonicalize it, which costs more than most solves
+            self.grids.move_to_end(raw)
+            self.hits += 1
+            outcome = solution.Outcome('solved' if answer else 'unsolvable', None, None, 0, 0.0)
+        else:
+            canonical, perm, labels = canonical_form(grid, diagonal)
+            key = raw[:2] + canonical
+            answer = self._lookup(key)
+            if answer is None:
+                self.misses += 1
+                outcome = solution.solve(canonical, diagonal=diagonal, **options)
+                if budgeted and outcome.status == 'exhausted':
+                    # says nothing about the grid, so it is not cached
+                    return outcome._replace(values=restore_values(outcome.values, perm, labels))
+                values = outcome.values if budgeted else outcome
+                answer = solution.grid_string(values) if values else ''
+                self._remember(self.entries, key, answer)
+                if self.store is not None:
+                    self.store[key] = answer
+            else:
+                self.hits += 1
+                outcome = solution.Outcome('solved' if answer else 'unsolvable', None, None, 0, 0.0)
+            answer = answer and restore(answer, perm, labels)
+            self._remember(self.grids, raw, answer)
+        values = answer and solution.grid_values(answer)
+        if budgeted:
+            return outcome._replace(values=values or False)
+        return values or False
@@ -0,0 +1,116 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import cache
+import solution
+
+
+def shuffled(grid, rng, diagonal=False):
+    """A random symmetric variant of a grid: relabeled digits and permuted lines, keeping the diagonals if asked."""
+    if diagonal:
+        perm = rng.choice(cache.DIAGONAL_PERMS)
+    else:
+        bands, stacks = rng.sample(range(3), 3), rng.sample(range(3), 3)
+        rows = [band * 3 + r for band in bands for r in rng.sample(range(3), 3)]
+        cols = [stack * 3 + c for stack in stacks for c in rng.sample(range(3), 3)]
+        if rng.random() < 0.5:
+            perm = [c * 9 + r for r in rows for c in cols]
+        else:
+            perm = [r * 9 + c for r in rows for c in cols]
+    labels = dict(zip('123456789', rng.sample('123456789', 9)))
+    labels['.'] = '.'
+    return ''.join(labels[grid[cell]] for cell in perm)
+
+
+class TestSolutionCache(unittest.TestCase):
+    hard_grid = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def test_canonical_form(self):
+        rng = random.Random(1)
+        for diagonal, grid in ((False, self.hard_grid), (True, self.diagonal_grid)):
+            key = cache.canonical_form(grid, diagonal)[0]
+            for _ in range(10):
+                self.assertEqual(cache.canonical_form(shuffled(grid, rng, diagonal), diagonal)[0], key)
+
+    def test_hits_map_back(self):
+        rng = random.Random(2)
+        for diagonal, grid in ((False, self.hard_grid), (True, self.diagonal_grid)):
+            solutions = cache.SolutionCache()
+            for _ in range(5):
+                variant = shuffled(grid, rng, diagonal)
+                self.assertEqual(solutions.solve(variant, diagonal=diagonal),
+                                 solution.solve(variant, diagonal=diagonal))
+            self.assertEqual((solutions.hits, solutions.misses), (4, 1))
+
+    def test_diagonal_keeps_diagonals(self):
+        # swapping the first two rows is a classic symmetry but breaks the diagonals
+        swapped = self.diagonal_grid[9:18] + self.diagonal_grid[:9] + self.diagonal_grid[18:]
+        self.assertEqual(cache.canonical_form(swapped)[0], cache.canonical_form(self.diagonal_grid)[0])
+        self.assertNotEqual(cache.canonical_form(swapped, True)[0], cache.canonical_form(self.diagonal_grid, True)[0])
+        # swapping rows 0 and 2, rows 6 and 8 and the same columns keeps them
+        lines = [2, 1, 0, 3, 4, 5, 8, 7, 6]
+        mirrored = ''.join(self.diagonal_grid[r * 9 + c] for r in lines for c in lines)
+        self.assertEqual(cache.canonical_form(mirrored, True)[0], cache.canonical_form(self.diagonal_grid, True)[0])
+
+    def test_variants(self):
+        solutions = cache.SolutionCache()
+        self.assertEqual(solutions.solve(self.diagonal_grid, variant='diagonal'),
+                         solution.solve(self.diagonal_grid, variant='diagonal'))
+        self.assertRaises(ValueError, solutions.solve, self.hard_grid, variant='windoku')
+
+    def test_same_grid(self):
+        solutions = cache.SolutionCache()
+        expected = solution.solve(self.hard_grid, diagonal=False)
+        self.assertEqual(solutions.solve(self.hard_grid, diagonal=False), expected)
+        canonical_form = cache.canonical_form
+        cache.canonical_form = None
+        try:
+            # found without canonicalizing
+            self.assertEqual(solutions.solve(self.hard_grid, diagonal=False), expected)
+        finally:
+            cache.canonical_form = canonical_form
+        self.assertEqual((solutions.hits, solutions.misses), (1, 1))
+        self.assertNotEqual(solutions.solve(self.hard_grid, diagonal=True), expected)
+        self.assertEqual(len(solutions.grids), 2)
+
+    def test_budget(self):
+        solutions = cache.SolutionCache()
+        variant = shuffled(self.hard_grid, random.Random(3))
+        outcome = solutions.solve(variant, diagonal=False, max_nodes=100000)
+        self.assertEqual(outcome.status, 'solved')
+        self.assertEqual(outcome.values, solution.solve(variant, diagonal=False))
+        self.assertEqual(solutions.solve(variant, diagonal=False, max_nodes=1).values, outcome.values)
+        self.assertEqual((solutions.hits, solutions.misses), (1, 1))
+        # an exhausted budget is not cached, and its board is mapped back to the grid
+        variant = shuffled('9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................',
+                           random.Random(4))
+        outcome = solutions.solve(variant, diagonal=False, max_nodes=1)
+        self.assertEqual(outcome.status, 'exhausted')
+        self.assertEqual(outcome.values, solution.solve(variant, diagonal=False, max_nodes=1).values)
+        self.assertEqual(len(solutions.entries), 1)
+
+    def test_lru_and_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'solutions')
+            unsolvable = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+            with cache.SolutionCache(maxsize=1, path=path) as solutions:
+                self.assertFalse(solutions.solve(unsolvable, diagonal=False))
+                self.assertTrue(solutions.solve(self.hard_grid, diagonal=False))
+                self.assertEqual(len(solutions.entries), 1)
+            with cache.SolutionCache(maxsize=1, path=path) as solutions:
+                self.assertFalse(solutions.solve(unsolvable, diagonal=False))
+                self.assertEqual((solutions.hits, solutions.misses), (1, 0))
+            with cache.SolutionCache(maxsize=0, path=path) as solutions:
+                self.assertTrue(solutions.solve(self.hard_grid, diagonal=False))
+                self.assertEqual((solutions.hits, len(solutions.entries)), (1, 0))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+Streaming command-line solver.
+
+Usage: python cli.py [options] [file ...]
+
+Reads puzzles from the given files, or from stdin, one per line: 81 characters with
+'.' or '0' for empty boxes (one character per box for --size 4, 16 or 25). Blank lines
+and lines starting with '#' are skipped. Packed corpora written by corpus.py are read
+too, from the mapped file; their rules come from the file, and options that contradict
+them are refused.
+Solutions are written to stdout as they are produced, and throughput and latency
+statistics are printed to stderr periodically. Input is read lazily and only a
+bounded window of latencies is kept, so memory use does not grow with the input.
+"""
+import argparse
+import collections
+import json
+import sys
+import time
+
+import batch
+import deduction
+import solution
+import variants
+
+try:
+    import corpus
+except ImportError:
+    # packed corpora need NumPy; without it every file is read as text
+    corpus = None
+
+
+def read_puzzles(paths):
+    """
+    Stream puzzles from files.
+    Args:
+        paths(list): file names; '-' or an empty list reads stdin
+    Returns:
+        an iterator of grids as strings
+    """
+
+    for path in paths or ['-']:
+        if corpus is not None and path != '-' and corpus.is_packed(path):
+            with corpus.PackedCorpus(path) as packed:
+                for grid in packed:
+                    yield grid
+            continue
+        stream = sys.stdin if path == '-' else open(path)
+        try:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def packed_geometry(paths):
+    """
+    The rules stored in the packed corpora among some files.
+    Args:
+        paths(list): file names, as for read_puzzles()
+    Returns:
+        the variants.Geometry of the packed corpora, or None if none of the files is packed
+    Raises:
+        ValueError: if the packed corpora have different rules
+    """
+
+    found = None
+    for path in paths:
+        if corpus is not None and path != '-' and corpus.is_packed(path):
+            with corpus.PackedCorpus(path) as packed:
+                if found is not None and packed.geometry is not found[1]:
+                    raise ValueError('{} holds {!r} puzzles but {} holds {!r}'.format(
+                        path, packed.geometry, found[0], found[1]))
+                found = (path, packed.geometry)
+    return found and found[1]
+
+
+def format_result(result, output_format, variant=None):
+    """
+    Render one batch.SolveResult.
+    Args:
+        result(batch.SolveResult): the outcome of a puzzle
+        output_format(string): 'line', 'grid' or 'json'
+        variant: the variant the puzzles were solved with, see solution.get_variant()
+    Returns:
+        the text to write, without a trailing newline
+    """
+
+    if result.error is not None:
+        status = 'timeout' if result.error == 'timeout' else 'error'
+    elif result.values is False:
+        status = 'unsolvable'
+    else:
+        status = 'solved'
+    rules = solution.get_variant(variant)
+    answer = solution.grid_string(result.values, rules) if status == 'solved' else None
+
+    if output_format == 'json':
+        record = {'index': result.index, 'puzzle': result.grid, 'status': status, 'solution': answer,
+                  'ms': round(result.elapsed * 1000, 3)}
+        if status == 'error':
+            record['error'] = result.error
+        return json.dumps(record)
+    if output_format == 'grid':
+        if answer is None:
+            return '# {} {}\n'.format(result.index, status)
+        size = rules.size
+        side = rules.side or size
+        lines = []
+        for r in range(0, size * size, size):
+            row = answer[r:r + size]
+            if lines and r % (side * size) == 0:
+                lines.append('-+-'.join(['-' * (2 * side - 1)] * (size // side)))
+            lines.append(' | '.join(' '.join(row[c:c + side]) for c in range(0, size, side)))
+        return '# {}\n{}\n'.format(result.index, '\n'.join(lines))
+    return answer if answer is not None else status
+
+
+class Stats:
+    """
+    Throughput and latency statistics over a sliding window.
+    Args:
+        window(int): number of most recent latencies kept for the percentiles
+    """
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def add(self, result):
+        self.count += 1
+        if result.error is not None or result.values is False:
+            self.failed += 1
+        self.latencies.append(result.elapsed)
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.count / elapsed if elapsed else 0.0
+        return '{} puzzles, {} unsolved, {:.1f} puzzles/sec, latency ms p50 {:.3f} p90 {:.3f} p99 {:.3f}'.format(
+            self.count, self.failed, rate, self.percentile(0.5) * 1000, self.percentile(0.9) * 1000,
+            self.percentile(0.99) * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a stream of sudoku puzzles, one per line.')
+    parser.add_argument('files', nargs='*', help="puzzle files, default stdin ('-')")
+    rules = parser.add_mutually_exclusive_group()
+    rules.add_argument('--diagonal', dest='diagonal', action='store_true', default=None,
+                       help='the diagonals are units too')
+    rules.add_argument('--standard', dest='diagonal', action='store_false', help='classic rules')
+    rules.add_argument('--variant', choices=[name for name in variants.VARIANTS if name != 'jigsaw'],
+                       help='rule set of the puzzles')
+    parser.add_argument('--size', type=int, help='digits per unit: 4, 9, 16 or 25. Default: 9')
+    parser.add_argument('--engine', choices=solution.engines, default='bitboard', help='solving backend')
+    parser.add_argument('--strategy', dest='strategies', action='append',
+                        choices=['all'] + sorted(deduction.strategies),
+                        help='deduction strategy to try when propagation stalls, may be repeated')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='worker processes, 0 to solve in this process (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=256, help='puzzles sent to a worker at a time')
+    parser.add_argument('--unordered', action='store_true', help='write results as they complete')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed per puzzle')
+    parser.add_argument('-f', '--format', choices=('line', 'grid', 'json'), default='line', help='output format')
+    parser.add_argument('--stats-interval', type=float, default=5.0,
+                        help='seconds between statistics on stderr, 0 to only print a summary')
+    args = parser.parse_args(argv)
+
+    options = {'engine': args.engine}
+    if args.strategies:
+        options['strategies'] = 'all' if 'all' in args.strategies else args.strategies
+    if args.variant is not None or args.size not in (None, 9):
+        name = args.variant or ('diagonal' if args.diagonal else 'classic')
+        options['variant'] = variants.variant(name, args.size or 9)
+    elif args.diagonal is not None:
+        options['diagonal'] = args.diagonal
+    try:
+        packed = packed_geometry(args.files)
+    except ValueError as e:
+        parser.error(str(e))
+    if packed is not None:
+        name = args.variant or {True: 'diagonal', False: 'classic', None: None}[args.diagonal]
+        if name not in (None, packed.name) or args.size not in (None, packed.size):
+            parser.error('the packed corpora hold {!r} puzzles, which the rule options contradict'.format(packed))
+        options.pop('diagonal', None)
+        options['variant'] = packed
+
+    stats = Stats()
+    last_report = time.perf_counter()
+    results = batch.solve_many(read_puzzles(args.files), workers=args.workers, chunksize=args.chunksize,
+                               ordered=not args.unordered, timeout=args.timeout, **options)
+    out = sys.stdout
+    try:
+        for result in results:
+            out.write(format_result(result, args.format, options.get('variant')) + '\n')
+            stats.add(result)
+            if args.stats_interval and time.perf_counter() - last_report >= args.stats_interval:
+                last_report = time.perf_counter()
+                sys.stderr.write(stats.report() + '\n')
+    except BrokenPipeError:
+        # the reader went away, e.g. `| head`
+        return 0
+    out.flush()
+    sys.stderr.write(stats.report() + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import cli
+import solution
+
+
+class TestCli(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def run_cli(self, lines, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(lines) + '\n')
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                cli.main(list(args) + ['-w', '0', f.name])
+        finally:
+            os.remove(f.name)
+        return out.getvalue().splitlines(), err.getvalue()
+
+    def test_line_format(self):
+        zeros = self.diagonal_grid.replace('.', '0')
+        lines, err = self.run_cli(['# comment', self.diagonal_grid, '', zeros, '11' + '.' * 79])
+        expected = solution.grid_string(solution.solve(self.diagonal_grid))
+        self.assertEqual(lines, [expected, expected, 'unsolvable'])
+        self.assertIn('3 puzzles, 1 unsolved', err)
+
+    def test_json_format(self):
+        lines, err = self.run_cli([self.diagonal_grid, 'garbage'], '--format', 'json', '--standard')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['status'] for record in records], ['solved', 'error'])
+        self.assertEqual(records[0]['solution'],
+                         solution.grid_string(solution.solve(self.diagonal_grid, diagonal=False)))
+
+    def test_strategies(self):
+        lines, err = self.run_cli([self.diagonal_grid], '--strategy', 'x_wing', '--strategy', 'hidden_pairs')
+        self.assertEqual(lines, [solution.grid_string(solution.solve(self.diagonal_grid))])
+
+
+if __name__ == '__main__':
+    unittest.main()
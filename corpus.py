@@ -0,0 +1,387 @@
+"""
+Packed binary puzzle corpora.
+
+Text corpora spend a byte per box plus a newline, and are parsed one character at a
+time. A packed corpus is a 64-byte header followed by fixed-size records, one per puzzle,
+in one of two layouts:
+
+    'nibble'  4 bits per box, two boxes per byte with the first in the high nibble:
+              0 for an empty box, i + 1 for the i-th digit. 41 bytes per 9 x 9 puzzle.
+              Boards of up to 15 digits.
+    'mask'    one little-endian uint16 candidate mask per box, as in bitboard.py and
+              vectorized.py, so the records are boards the vectorized engine reads
+              without any decoding. Boards of up to 16 digits, and boards with some
+              candidates already removed can be stored.
+
+Records have a fixed size, so the index of the file is arithmetic: record i starts at
+byte HEADER_SIZE + i * record_size. The header holds the magic, the format version, the
+layout, the variant name and size, the number of boxes, the record size and the number
+of records.
+
+PackedCorpus maps a file into memory and only reads the header when it is opened; the
+records are numpy views of the mapping, decoded a block at a time as they are used, so
+the operating system pages in what is read and the corpus doesn't use any memory of its
+own. pack() and pack_text() parse text in blocks of BLOCK_SIZE grids with a few array
+operations per block, and unpack_text() writes text back.
+
+Usage: python corpus.py pack [--layout nibble|mask] [--variant NAME] [--size N] TEXT PACKED
+       python corpus.py unpack PACKED TEXT
+       python corpus.py info PACKED
+
+NumPy is needed here, as in vectorized.py.
+"""
+import argparse
+import functools
+import itertools
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+import solution
+import variants
+
+MAGIC = b'SUDOKUPK'
+VERSION = 1
+LAYOUTS = ('nibble', 'mask')
+# magic, version, layout, digits per unit, boxes, record size, records, variant name
+HEADER = struct.Struct('<8sHBBHHQ16s')
+HEADER_SIZE = 64
+# grids parsed or decoded per array operation
+BLOCK_SIZE = 65536
+# the largest board each layout holds, in digits per unit
+MAX_DIGITS = {'nibble': 15, 'mask': 16}
+
+# code of a character that is neither a digit, '.' nor '0'
+_INVALID = 255
+
+
+class _Tables:
+    """Lookup tables between the characters, codes and masks of a geometry's boxes."""
+
+    def __init__(self, geometry):
+        digits = geometry.digits
+        # code of every character of a grid: 0 for an empty box, i + 1 for the i-th digit
+        self.codes = np.full(256, _INVALID, dtype=np.uint8)
+        self.codes[ord('.')] = self.codes[ord('0')] = 0
+        for i, digit in enumerate(digits):
+            self.codes[ord(digit)] = i + 1
+        self.chars = np.frombuffer(('.' + digits).encode('ascii'), dtype=np.uint8)
+        if len(digits) <= MAX_DIGITS['mask']:
+            self.masks = np.array([geometry.all_digits] + [1 << i for i in range(len(digits))], dtype=np.uint16)
+            # code of every mask: the digit of a single candidate, 0 for anything else
+            self.mask_codes = np.zeros(1 << len(digits), dtype=np.uint8)
+            self.mask_codes[self.masks[1:]] = np.arange(1, len(digits) + 1)
+
+
+@functools.lru_cache(maxsize=None)
+def _tables(geometry):
+    return _Tables(geometry)
+
+
+def _layout_for(geometry, layout):
+    """Check that a geometry can be packed in a layout."""
+    if layout not in LAYOUTS:
+        raise ValueError('unknown layout {!r}, expected one of {}'.format(layout, ', '.join(LAYOUTS)))
+    if len(geometry.digits) > MAX_DIGITS[layout]:
+        raise ValueError('the {} layout holds at most {} digits per unit, not {}'.format(
+            layout, MAX_DIGITS[layout], len(geometry.digits)))
+    if geometry.key is None or geometry.key[2] is not None:
+        raise ValueError('only the named variants can be packed, not {!r}'.format(geometry))
+    return layout
+
+
+def parse(grids, variant=None):
+    """
+    Parse grids in bulk.
+    Args:
+        grids(list): strings with one character per box, '.' or '0' for empty boxes
+        variant: the rules of the grids, see solution.get_variant()
+    Returns:
+        an (N, boxes) uint8 array of codes: 0 for an empty box, i + 1 for the i-th digit
+    Raises:
+        ValueError: if a grid has the wrong length or a character that is not a digit, '.' or '0'
+    """
+
+    geometry = solution.get_variant(variant)
+    cells = len(geometry.boxes)
+    lengths = np.fromiter(map(len, grids), dtype=np.intp, count=len(grids))
+    wrong = np.flatnonzero(lengths != cells)
+    if len(wrong):
+        raise ValueError('grid {} has {} boxes, expected {}'.format(wrong[0], lengths[wrong[0]], cells))
+    try:
+        data = ''.join(grids).encode('ascii')
+    except UnicodeEncodeError:
+        raise ValueError('grids must be ASCII')
+    codes = _tables(geometry).codes[np.frombuffer(data, dtype=np.uint8)].reshape(len(grids), cells)
+    invalid = (codes == _INVALID).any(axis=1)
+    if invalid.any():
+        raise ValueError('grid {} has characters other than digits, . and 0'.format(int(np.argmax(invalid))))
+    return codes
+
+
+def encode(codes, geometry, layout):
+    """Turn an (N, boxes) array of codes into an (N, record size) array of bytes."""
+    if layout == 'mask':
+        return _tables(geometry).masks[codes].astype('<u2').view(np.uint8)
+    if codes.shape[1] % 2:
+        codes = np.concatenate([codes, np.zeros((len(codes), 1), dtype=np.uint8)], axis=1)
+    return codes[:, 0::2] << 4 | codes[:, 1::2]
+
+
+def _header(geometry, layout, count):
+    cells = len(geometry.boxes)
+    record_size = (cells + 1) // 2 if layout == 'nibble' else 2 * cells
+    name = geometry.key[0].encode('ascii')
+    return HEADER.pack(MAGIC, VERSION, LAYOUTS.index(layout), len(geometry.digits), cells, record_size,
+                       count, name).ljust(HEADER_SIZE, b'\0')
+
+
+def _write(blocks, path, geometry, layout):
+    """
+    Write blocks of grids, lists of strings, to a packed corpus. Returns the number of grids.
+    The file is written next to `path` and renamed over it once complete, so a failure
+    leaves whatever was at `path` as it was.
+    """
+
+    _layout_for(geometry, layout)
+    count = 0
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temporary, 'wb') as f:
+            # the count is only known at the end
+            f.write(bytes(HEADER_SIZE))
+            for block in blocks:
+                try:
+                    codes = parse(block, geometry)
+                except ValueError as e:
+                    raise ValueError('after {} grids: {}'.format(count, e))
+                f.write(encode(codes, geometry, layout).tobytes())
+                count += len(block)
+            f.seek(0)
+            f.write(_header(geometry, layout, count))
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return count
+
+
+def pack(grids, path, variant=None, layout='nibble'):
+    """
+    Write grids to a packed corpus, BLOCK_SIZE at a time.
+    Args:
+        grids(iterable): grids as strings. Consumed lazily.
+        path(string): file to write
+        variant: the rules of the grids, see solution.get_variant(). Jigsaw regions can't be stored.
+        layout(string): 'nibble' or 'mask'
+    Returns:
+        the number of grids written
+    Raises:
+        ValueError: if a grid is malformed, or the variant doesn't fit the layout
+    """
+
+    grids = iter(grids)
+    blocks = iter(lambda: list(itertools.islice(grids, BLOCK_SIZE)), [])
+    return _write(blocks, path, solution.get_variant(variant), layout)
+
+
+def pack_text(source, path, variant=None, layout='nibble'):
+    """
+    Convert a text corpus, in the format of puzzles/*.txt, to a packed corpus.
+    Args:
+        source(string): text file with one grid per line. Blank lines and lines starting
+            with '#' are skipped.
+        path(string): file to write
+        variant: the rules of the grids. Default: diagonal if a '# rules: diagonal' line
+            comes before the first grid, as benchmark.load_corpus() reads it, otherwise classic.
+        layout(string): 'nibble' or 'mask'
+    Returns:
+        the number of grids written
+    """
+
+    with open(source) as f:
+        # lines are read and filtered a block at a time, which is much faster than line by line
+        blocks = ([line for line in map(str.strip, lines) if line and line[0] != '#']
+                  for lines in iter(lambda: f.readlines(BLOCK_SIZE * 82), []))
+        if variant is None:
+            diagonal = False
+            for line in f:
+                line = line.strip()
+                if line.startswith('#'):
+                    diagonal = diagonal or line.replace(' ', '') == '#rules:diagonal'
+                elif line:
+                    break
+            f.seek(0)
+            variant = 'diagonal' if diagonal else 'classic'
+        return _write((block for block in blocks if block), path, solution.get_variant(variant), layout)
+
+
+def is_packed(path):
+    """Whether a file starts like a packed corpus."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class PackedCorpus:
+    """
+    A packed corpus, memory-mapped. Indexing and iterating give grids as strings.
+    Args:
+        path(string): a file written by pack()
+    Raises:
+        ValueError: if the file is not a packed corpus
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+                raise ValueError('{} is not a packed corpus'.format(path))
+            magic, version, layout, size, cells, record_size, count, name = HEADER.unpack_from(header)
+            if version != VERSION or layout >= len(LAYOUTS):
+                raise ValueError('{}: unsupported version {} or layout {}'.format(path, version, layout))
+            self.layout = LAYOUTS[layout]
+            self.geometry = variants.variant(name.rstrip(b'\0').decode('ascii'), size)
+            self.count = count
+            self.record_size = record_size
+            if cells != len(self.geometry.boxes) or os.fstat(f.fileno()).st_size < HEADER_SIZE + count * record_size:
+                raise ValueError('{}: truncated, or not a {}'.format(path, self.geometry))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """
+        The records, without copying anything.
+        Returns:
+            a read-only view of the mapped file: (N, boxes) uint16 candidate masks in the
+            mask layout, (N, record size) bytes in the nibble layout
+        """
+
+        if self._map is None:
+            empty = np.zeros((0, self.record_size), dtype=np.uint8)
+            return empty.view('<u2') if self.layout == 'mask' else empty
+        dtype = np.dtype('<u2') if self.layout == 'mask' else np.dtype(np.uint8)
+        return np.frombuffer(self._map, dtype=dtype, count=self.count * self.record_size // dtype.itemsize,
+                             offset=HEADER_SIZE).reshape(self.count, -1)
+
+    def codes(self, start=0, stop=None):
+        """Records start to stop as an (N, boxes) uint8 array of codes, as parse() returns them."""
+        records = self.records()[start:stop]
+        if self.layout == 'mask':
+            return _tables(self.geometry).mask_codes[records]
+        codes = np.empty((len(records), 2 * self.record_size), dtype=np.uint8)
+        codes[:, 0::2] = records >> 4
+        codes[:, 1::2] = records & 15
+        return codes[:, :len(self.geometry.boxes)]
+
+    def masks(self, start=0, stop=None):
+        """
+        Records start to stop as (N, boxes) uint16 candidate masks, as vectorized.py takes
+        them. In the mask layout this is a read-only view of the file; in the nibble layout
+        the range is decoded, so pass ranges of a large corpus.
+        """
+
+        if self.layout == 'mask':
+            return self.records()[start:stop]
+        return _tables(self.geometry).masks[self.codes(start, stop)]
+
+    def text(self, start=0, stop=None):
+        """Records start to stop as an (N, boxes + 1) array of ASCII characters, each row ending in a newline."""
+        codes = self.codes(start, stop)
+        rows = np.empty((len(codes), codes.shape[1] + 1), dtype=np.uint8)
+        rows[:, :-1] = _tables(self.geometry).chars[codes]
+        rows[:, -1] = ord('\n')
+        return rows
+
+    def grids(self, start=0, stop=None):
+        """Records start to stop as a list of grid strings, with '.' for empty boxes."""
+        return self.text(start, stop).tobytes().decode('ascii').splitlines()
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('corpus index out of range')
+        return self.grids(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self.count, BLOCK_SIZE):
+            for grid in self.grids(start, start + BLOCK_SIZE):
+                yield grid
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # arrays from records() still point into the mapping, which goes with them
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return '<PackedCorpus {} {} {} puzzles of {!r}>'.format(self.path, self.layout, self.count, self.geometry)
+
+
+def unpack_text(source, path):
+    """
+    Convert a packed corpus to text, one grid per line, BLOCK_SIZE at a time. A diagonal
+    corpus starts with a '# rules: diagonal' line, as in puzzles/*.txt. Candidates stored
+    in the mask layout are lost: boxes with more than one are written as '.'.
+    Returns:
+        the number of grids written
+    """
+
+    with PackedCorpus(source) as packed, open(path, 'wb') as f:
+        if packed.geometry.key[0] == 'diagonal':
+            f.write(b'# rules: diagonal\n')
+        for start in range(0, len(packed), BLOCK_SIZE):
+            f.write(packed.text(start, start + BLOCK_SIZE).tobytes())
+        return len(packed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert puzzle corpora between text and the packed format.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack_parser = commands.add_parser('pack', help='text to packed')
+    pack_parser.add_argument('source', help='text corpus, one grid per line')
+    pack_parser.add_argument('path', help='packed corpus to write')
+    pack_parser.add_argument('--layout', choices=LAYOUTS, default='nibble', help='record layout')
+    pack_parser.add_argument('--variant', choices=[name for name in variants.VARIANTS if name != 'jigsaw'],
+                             help="rules; default from a '# rules: diagonal' line, otherwise classic")
+    pack_parser.add_argument('--size', type=int, help='digits per unit: 4, 9 or 16. Default: 9')
+    unpack_parser = commands.add_parser('unpack', help='packed to text')
+    unpack_parser.add_argument('source', help='packed corpus')
+    unpack_parser.add_argument('path', help='text corpus to write')
+    info_parser = commands.add_parser('info', help='describe a packed corpus')
+    info_parser.add_argument('path', help='packed corpus')
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        variant = None
+        if args.variant is not None or args.size is not None:
+            variant = variants.variant(args.variant or 'classic', args.size or 9)
+        count = pack_text(args.source, args.path, variant, args.layout)
+        sys.stderr.write('{} grids packed into {}\n'.format(count, args.path))
+    elif args.command == 'unpack':
+        sys.stderr.write('{} grids written to {}\n'.format(unpack_text(args.source, args.path), args.path))
+    else:
+        with PackedCorpus(args.path) as packed:
+            print('{}: {} puzzles of {!r}, {} layout, {} bytes each'.format(
+                args.path, len(packed), packed.geometry, packed.layout, packed.record_size))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import benchmark
+import cli
+import solution
+import variants
+
+try:
+    import corpus
+    import vectorized
+except ImportError:
+    corpus = None
+
+
+@unittest.skipIf(corpus is None, 'NumPy is not installed')
+class TestCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.hard = benchmark.bundled_corpora()['hard'].grids
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_round_trip(self):
+        grids = [grid.replace('0', '.') for grid in self.hard]
+        for layout in corpus.LAYOUTS:
+            path = self.path(layout)
+            self.assertEqual(corpus.pack(iter(grids), path, 'classic', layout), len(grids))
+            with corpus.PackedCorpus(path) as packed:
+                self.assertEqual(packed.layout, layout)
+                self.assertIs(packed.geometry, solution.classic_geometry)
+                self.assertEqual(len(packed), len(grids))
+                self.assertEqual(list(packed), grids)
+                self.assertEqual(packed[3], grids[3])
+                self.assertEqual(packed[-1], grids[-1])
+                self.assertRaises(IndexError, packed.__getitem__, len(grids))
+                self.assertEqual(packed.grids(5, 8), grids[5:8])
+        self.assertEqual(os.path.getsize(self.path('nibble')), corpus.HEADER_SIZE + 41 * len(grids))
+
+    def test_blocks(self):
+        # more grids than a block, so they are parsed and decoded in several
+        grids = [grid.replace('0', '.') for grid in self.hard]
+        block_size = corpus.BLOCK_SIZE
+        corpus.BLOCK_SIZE = 7
+        try:
+            corpus.pack(grids, self.path('blocks'), 'classic')
+            with corpus.PackedCorpus(self.path('blocks')) as packed:
+                self.assertEqual(list(packed), grids)
+        finally:
+            corpus.BLOCK_SIZE = block_size
+
+    def test_other_sizes(self):
+        for size, layouts in ((4, corpus.LAYOUTS), (16, ('mask',))):
+            rules = variants.variant('classic', size)
+            grid = solution.grid_string(solution.solve('.' * size ** 2, variant=rules), rules)
+            grids = [grid, '.' * size ** 2, grid[:5] + '.' * (size ** 2 - 5)]
+            for layout in layouts:
+                corpus.pack(grids, self.path('sized'), rules, layout)
+                with corpus.PackedCorpus(self.path('sized')) as packed:
+                    self.assertIs(packed.geometry, rules)
+                    self.assertEqual(list(packed), grids)
+        self.assertRaises(ValueError, corpus.pack, [], self.path('large'), variants.variant('classic', 16), 'nibble')
+        self.assertRaises(ValueError, corpus.pack, [], self.path('large'), variants.variant('classic', 25), 'mask')
+
+    def test_text(self):
+        source = os.path.join(benchmark.PUZZLE_DIR, 'diagonal.txt')
+        text = benchmark.load_corpus(source)
+        self.assertEqual(corpus.pack_text(source, self.path('diagonal')), len(text.grids))
+        self.assertTrue(corpus.is_packed(self.path('diagonal')))
+        self.assertFalse(corpus.is_packed(source))
+        self.assertIs(corpus.PackedCorpus(self.path('diagonal')).geometry, solution.diagonal_geometry)
+        corpus.unpack_text(self.path('diagonal'), self.path('diagonal.txt'))
+        again = benchmark.load_corpus(self.path('diagonal.txt'))
+        self.assertTrue(again.diagonal)
+        self.assertEqual(again.grids, [grid.replace('0', '.') for grid in text.grids])
+        self.assertEqual(list(cli.read_puzzles([self.path('diagonal')])), again.grids)
+
+    def test_cli_rules(self):
+        corpus.pack(self.hard[:3], self.path('classic'), 'classic')
+        corpus.pack(self.hard[:3], self.path('diagonal'), 'diagonal')
+        expected = [solution.grid_string(solution.solve(grid, diagonal=False)) for grid in self.hard[:3]]
+        for options in ([], ['--standard'], ['--variant', 'classic', '--size', '9']):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+                cli.main(options + ['-w', '0', self.path('classic')])
+            self.assertEqual(out.getvalue().splitlines(), expected)
+        # the file's rules win over the default, and options that contradict them are refused
+        self.assertIs(cli.packed_geometry([self.path('classic')]), solution.classic_geometry)
+        self.assertRaises(ValueError, cli.packed_geometry, [self.path('classic'), self.path('diagonal')])
+        for options in (['--diagonal'], ['--size', '4'], [self.path('diagonal')]):
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertRaises(SystemExit, cli.main, options + ['-w', '0', self.path('classic')])
+
+    def test_main(self):
+        rules = variants.variant('classic', 4)
+        grid = solution.grid_string(solution.solve('.' * 16, variant=rules), rules)
+        with open(self.path('small.txt'), 'w') as f:
+            f.write(grid + '\n' + '.' * 16 + '\n')
+        # --size alone means classic rules of that size
+        self.assertEqual(corpus.main(['pack', self.path('small.txt'), self.path('small'), '--size', '4']), 0)
+        with corpus.PackedCorpus(self.path('small')) as packed:
+            self.assertIs(packed.geometry, rules)
+            self.assertEqual(list(packed), [grid, '.' * 16])
+
+    def test_malformed(self):
+        self.assertRaises(ValueError, corpus.parse, ['1' * 80], 'classic')
+        self.assertRaises(ValueError, corpus.parse, ['x' * 81], 'classic')
+        self.assertRaises(ValueError, corpus.parse, ['é' * 81], 'classic')
+        self.assertRaises(ValueError, corpus.pack, self.hard + ['?'], self.path('bad'), 'classic')
+        self.assertRaises(ValueError, corpus.pack, self.hard, self.path('bad'), 'classic', 'bits')
+        self.assertEqual(os.listdir(self.directory), [])
+        # a failed pack leaves the file it would have replaced intact
+        corpus.pack(self.hard[:3], self.path('good'), 'classic')
+        self.assertRaises(ValueError, corpus.pack, self.hard + ['?'], self.path('good'), 'classic')
+        self.assertEqual(os.listdir(self.directory), ['good'])
+        with corpus.PackedCorpus(self.path('good')) as packed:
+            self.assertEqual(len(packed), 3)
+        self.assertRaises(ValueError, corpus.PackedCorpus, os.path.join(benchmark.PUZZLE_DIR, 'hard.txt'))
+
+    def test_empty(self):
+        self.assertEqual(corpus.pack([], self.path('empty'), 'classic', 'mask'), 0)
+        with corpus.PackedCorpus(self.path('empty')) as packed:
+            self.assertEqual(list(packed), [])
+            self.assertEqual(packed.masks().shape, (0, 81))
+
+    def test_vectorized(self):
+        for layout in corpus.LAYOUTS:
+            corpus.pack(self.hard, self.path(layout), 'classic', layout)
+            with corpus.PackedCorpus(self.path(layout)) as packed:
+                masks = packed.masks()
+                self.assertTrue((masks == vectorized.grids_to_masks(self.hard, solution.classic_geometry)).all())
+                if layout == 'mask':
+                    # a view of the mapped file, left as it is
+                    self.assertFalse(masks.flags.writeable)
+                self.assertEqual(vectorized.solve_boards(masks, solution.classic_geometry, batch_size=8),
+                                 vectorized.solve_batch(self.hard, solution.classic_geometry))
+                del masks
+
+
+if __name__ == '__main__':
+    unittest.main()
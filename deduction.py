@@ -0,0 +1,231 @@
+"""
+Advanced deduction strategies on candidate-mask boards.
+
+bitboard.propagate() always applies its cheap strategies (eliminate, only_choice and
+naked twins) from a worklist. The strategies here are more expensive and are only run
+when that worklist stalls: propagate() tries them in the order given, and the first one
+that removes anything hands the changed cells back to the worklist, so each stronger
+rule is used only as long as the cheaper ones have nothing left to do.
+
+Every strategy takes (board, geometry) and returns a list of (cell, digits to remove)
+pairs without changing the board, so propagate() can apply the removals through the
+undo trail of the in-place search. A board a strategy sees is propagated: solved cells
+have been eliminated from their peers.
+
+STRATEGIES lists them from cheapest to most expensive:
+    locked_candidates   pointing pairs and box/line reduction
+    hidden_pairs, hidden_triples
+    naked_triples, naked_quads
+    x_wing, swordfish   need the rows and columns of a board built by variants.variant()
+"""
+import functools
+import itertools
+
+
+def _unsolved(board, unit, popcount):
+    return [cell for cell in unit if popcount[board[cell]] > 1]
+
+
+@functools.lru_cache(maxsize=None)
+def _intersections(geometry):
+    """(shared cells, rest of the first unit, rest of the second) for every two units sharing at least two cells."""
+    intersections = []
+    for u, unit in enumerate(geometry.unitlist):
+        for other in geometry.unitlist[u + 1:]:
+            shared = [cell for cell in unit if cell in other]
+            if len(shared) > 1:
+                intersections.append((tuple(shared), tuple(cell for cell in unit if cell not in shared),
+                                      tuple(cell for cell in other if cell not in shared)))
+    return intersections
+
+
+def locked_candidates(board, geometry):
+    """
+    When a digit's candidates in one unit all lie where it crosses another unit, the digit
+    must go there, so it is removed from the rest of the other unit. With a box and a line
+    this is a pointing pair (box to line) or a box/line reduction (line to box); the
+    diagonals, windows and jigsaw regions of the other variants are handled the same way.
+    """
+
+    removals = []
+    for shared, first, second in _intersections(geometry):
+        inside = 0
+        for cell in shared:
+            inside |= board[cell]
+        for rest, other in ((first, second), (second, first)):
+            outside = 0
+            for cell in rest:
+                outside |= board[cell]
+            locked = inside & ~outside
+            if locked:
+                for cell in other:
+                    if board[cell] & locked:
+                        removals.append((cell, locked))
+    return removals
+
+
+def _naked_subsets(board, geometry, size):
+    """`size` unsolved cells of a unit with only `size` candidates between them keep those digits to themselves."""
+    popcount = geometry.popcount
+    removals = []
+    for unit in geometry.unitlist:
+        unsolved = _unsolved(board, unit, popcount)
+        if len(unsolved) <= size:
+            continue
+        small = [cell for cell in unsolved if popcount[board[cell]] <= size]
+        for subset in itertools.combinations(small, size):
+            digits = 0
+            for cell in subset:
+                digits |= board[cell]
+            if popcount[digits] != size:
+                continue
+            for cell in unsolved:
+                if cell not in subset and board[cell] & digits:
+                    removals.append((cell, digits))
+    return removals
+
+
+def _hidden_subsets(board, geometry, size):
+    """`size` digits that only fit in the same `size` cells of a unit leave no room there for other digits."""
+    popcount = geometry.popcount
+    removals = []
+    for unit in geometry.unitlist:
+        unsolved = _unsolved(board, unit, popcount)
+        if len(unsolved) <= size:
+            continue
+        # {digit mask: bit k set if the digit is a candidate of unsolved[k]}
+        where = {}
+        for k, cell in enumerate(unsolved):
+            mask = board[cell]
+            while mask:
+                digit = mask & -mask
+                mask ^= digit
+                where[digit] = where.get(digit, 0) | 1 << k
+        # a digit with one place left is placed by only_choice; more than `size` can't be in the subset
+        candidates = [digit for digit, places in where.items() if 1 < popcount[places] <= size]
+        for subset in itertools.combinations(candidates, size):
+            places = 0
+            digits = 0
+            for digit in subset:
+                places |= where[digit]
+                digits |= digit
+            if popcount[places] != size:
+                continue
+            for k, cell in enumerate(unsolved):
+                if places >> k & 1 and board[cell] & ~digits:
+                    removals.append((cell, board[cell] & ~digits))
+    return removals
+
+
+def _fish(board, geometry, size):
+    """
+    If a digit's candidates in `size` rows lie in only `size` columns, those rows hold
+    it in those columns, so it is removed from the rest of the columns; and the same with
+    rows and columns swapped. Size 2 is an X-Wing, size 3 a Swordfish.
+    """
+
+    if geometry.rows is None:
+        return []
+    n = len(geometry.rows)
+    popcount = geometry.popcount
+    # positions[0][i][row] has bit c set if digit i is a candidate of the unsolved cell at
+    # row, c; positions[1] holds the same by column
+    positions = ([[0] * n for i in range(n)], [[0] * n for i in range(n)])
+    for cell, mask in enumerate(board):
+        if popcount[mask] == 1:
+            continue
+        row, col = divmod(cell, n)
+        while mask:
+            digit = mask & -mask
+            mask ^= digit
+            i = digit.bit_length() - 1
+            positions[0][i][row] |= 1 << col
+            positions[1][i][col] |= 1 << row
+
+    removals = []
+    for i in range(n):
+        digit = 1 << i
+        for transposed in (False, True):
+            lines = positions[transposed][i]
+            crossing = positions[not transposed][i]
+            bases = [line for line in range(n) if 1 < popcount[lines[line]] <= size]
+            for subset in itertools.combinations(bases, size):
+                covered = 0
+                base = 0
+                for line in subset:
+                    covered |= lines[line]
+                    base |= 1 << line
+                if popcount[covered] != size:
+                    continue
+                for position in range(n):
+                    if covered >> position & 1:
+                        # the other lines through this position
+                        others = crossing[position] & ~base
+                        while others:
+                            line = (others & -others).bit_length() - 1
+                            others &= others - 1
+                            removals.append((position * n + line if transposed else line * n + position, digit))
+    return removals
+
+
+def hidden_pairs(board, geometry):
+    """Two digits that only fit in the same two cells of a unit; other candidates are removed from them."""
+    return _hidden_subsets(board, geometry, 2)
+
+
+def hidden_triples(board, geometry):
+    """Three digits that only fit in the same three cells of a unit."""
+    return _hidden_subsets(board, geometry, 3)
+
+
+def naked_triples(board, geometry):
+    """Three cells of a unit with only three candidates between them."""
+    return _naked_subsets(board, geometry, 3)
+
+
+def naked_quads(board, geometry):
+    """Four cells of a unit with only four candidates between them."""
+    return _naked_subsets(board, geometry, 4)
+
+
+def x_wing(board, geometry):
+    """A digit confined to the same two columns in two rows, or the other way round."""
+    return _fish(board, geometry, 2)
+
+
+def swordfish(board, geometry):
+    """A digit confined to the same three columns in three rows, or the other way round."""
+    return _fish(board, geometry, 3)
+
+
+# cheapest first: the order propagate() escalates in
+STRATEGIES = (locked_candidates, hidden_pairs, naked_triples, hidden_triples, x_wing, naked_quads, swordfish)
+strategies = dict((strategy.__name__, strategy) for strategy in STRATEGIES)
+
+
+def resolve(names):
+    """
+    The strategy set of a solve.
+    Args:
+        names: None for none, 'all' for all of STRATEGIES, or an iterable of names in
+            `strategies` or strategy functions
+    Returns:
+        a tuple of strategy functions, known ones in cost order, others after them
+    Raises:
+        ValueError: for an unknown name
+    """
+
+    if names is None:
+        return ()
+    if names == 'all':
+        return STRATEGIES
+    chosen = []
+    for name in names:
+        if isinstance(name, str):
+            if name not in strategies:
+                raise ValueError('unknown strategy {!r}, expected one of {}'.format(name, sorted(strategies)))
+            name = strategies[name]
+        if name not in chosen:
+            chosen.append(name)
+    rank = dict((strategy, i) for i, strategy in enumerate(STRATEGIES))
+    return tuple(sorted(chosen, key=lambda strategy: rank.get(strategy, len(rank))))
@@ -0,0 +1,93 @@
+import unittest
+
+import benchmark
+import bitboard
+import deduction
+import solution
+
+
+class TestDeduction(unittest.TestCase):
+    geometry = solution.classic_geometry
+    all_digits = geometry.all_digits
+
+    def empty_board(self):
+        return [self.all_digits] * 81
+
+    def removed(self, strategy, board):
+        """{cell: digits removed} after applying one round of a strategy."""
+        removed = {}
+        for cell, digits in strategy(board, self.geometry):
+            removed[cell] = removed.get(cell, 0) | (digits & board[cell])
+        return removed
+
+    def test_locked_candidates(self):
+        board = self.empty_board()
+        # digit 1 only fits in the top row of the first box
+        for cell in (9, 10, 11, 18, 19, 20):
+            board[cell] &= ~1
+        removed = self.removed(deduction.locked_candidates, board)
+        self.assertEqual(sorted(removed), list(range(3, 9)))
+        self.assertTrue(all(digits == 1 for digits in removed.values()))
+
+    def test_hidden_pair(self):
+        board = self.empty_board()
+        # digits 1 and 2 only fit in the first two cells of the top row
+        for cell in range(2, 9):
+            board[cell] &= ~0b11
+        removed = self.removed(deduction.hidden_pairs, board)
+        self.assertEqual(removed[0], self.all_digits & ~0b11)
+        self.assertEqual(removed[1], self.all_digits & ~0b11)
+
+    def test_naked_triple(self):
+        board = self.empty_board()
+        board[0], board[4], board[8] = 0b011, 0b110, 0b101
+        removed = self.removed(deduction.naked_triples, board)
+        self.assertEqual(sorted(removed), [1, 2, 3, 5, 6, 7])
+        self.assertTrue(all(digits == 0b111 for digits in removed.values()))
+
+    def test_x_wing(self):
+        board = self.empty_board()
+        # digit 1 only fits in columns 3 and 8 in rows 1 and 5
+        for row in (1, 5):
+            for col in range(9):
+                if col not in (3, 8):
+                    board[row * 9 + col] &= ~1
+        removed = self.removed(deduction.x_wing, board)
+        self.assertEqual(sorted(removed), [row * 9 + col for row in (0, 2, 3, 4, 6, 7, 8) for col in (3, 8)])
+        self.assertTrue(all(digits == 1 for digits in removed.values()))
+        self.assertEqual(deduction.swordfish(board, self.geometry), [])
+
+    def test_sound(self):
+        # no strategy removes a digit of the solution from any board on the way to it
+        corpora = benchmark.bundled_corpora()
+        for grid in corpora['hard'].grids[:10] + corpora['hardest17'].grids:
+            answer = bitboard.from_values(solution.solve(grid, diagonal=False), self.geometry)
+            board = bitboard.propagate(bitboard.from_values(solution.grid_values(grid, self.geometry), self.geometry),
+                                       self.geometry)
+            for strategy in deduction.STRATEGIES:
+                for cell, digits in strategy(board, self.geometry):
+                    self.assertFalse(digits & answer[cell], (grid, strategy.__name__, cell))
+
+    def test_fewer_nodes(self):
+        for grid in benchmark.bundled_corpora()['hardest17'].grids:
+            plain, plain_stats = solution.solve_with_stats(grid, diagonal=False)
+            stronger, stats = solution.solve_with_stats(grid, diagonal=False, strategies='all')
+            self.assertEqual(stronger, plain)
+            self.assertLessEqual(stats.nodes, plain_stats.nodes)
+            self.assertIn('locked_candidates', stats.strategy_time)
+            for search_mode in solution.search_modes:
+                self.assertEqual(solution.solve(grid, search_mode=search_mode, diagonal=False,
+                                                strategies=['x_wing']), plain)
+            self.assertEqual(solution.solve(grid, engine='dlx', diagonal=False, strategies='all'), plain)
+
+    def test_resolve(self):
+        self.assertEqual(deduction.resolve(None), ())
+        self.assertEqual(deduction.resolve('all'), deduction.STRATEGIES)
+        self.assertEqual(deduction.resolve(['swordfish', 'locked_candidates', deduction.swordfish]),
+                         (deduction.locked_candidates, deduction.swordfish))
+        self.assertRaises(ValueError, deduction.resolve, ['guessing'])
+        self.assertRaises(ValueError, solution.solve, '.' * 81, strategies=['guessing'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+Exact-cover solving backend: Algorithm X with Dancing Links.
+
+A sudoku is an exact-cover problem. Every (cell, digit) candidate is a row, and every
+constraint is a column that must be covered exactly once: one column per cell (the cell
+holds one digit) and one per unit and digit (the unit holds the digit once). The units
+come from the geometry, so the diagonals of a diagonal sudoku, the windows of a windoku
+and jigsaw regions are columns like the rows, columns and boxes.
+
+The board is propagated first, so the matrix only holds the unsolved cells and the
+constraints they still have to meet. The columns and rows are circular doubly linked
+lists kept in flat arrays, and the search is iterative, so deep searches on large grids
+don't hit the recursion limit.
+"""
+import time
+
+import bitboard
+
+
+def build(board, geometry):
+    """
+    Build the exact-cover matrix of a propagated board.
+    Args:
+        board(list): candidate masks
+        geometry(variants.Geometry): unit tables
+    Returns:
+        (left, right, up, down, column, size, rows): the link arrays, where node 0 is the
+        root, the column headers follow it, and rows[node] is the (cell, digit mask) of
+        the candidate a row node belongs to
+    """
+
+    popcount = geometry.popcount
+    cell_units = geometry.cell_units
+    unsolved = [cell for cell, mask in enumerate(board) if popcount[mask] > 1]
+
+    # header index of every constraint still to be met
+    columns = {}
+    for cell in unsolved:
+        columns[cell] = len(columns) + 1
+    for cell in unsolved:
+        candidates = board[cell]
+        while candidates:
+            digit = candidates & -candidates
+            candidates ^= digit
+            for u in cell_units[cell]:
+                if (u, digit) not in columns:
+                    columns[u, digit] = len(columns) + 1
+
+    count = len(columns) + 1
+    left = [i - 1 for i in range(count)]
+    left[0] = count - 1
+    right = [i + 1 for i in range(count)]
+    right[-1] = 0
+    up = list(range(count))
+    down = list(range(count))
+    column = list(range(count))
+    size = [0] * count
+    rows = [None] * count
+
+    for cell in unsolved:
+        candidates = board[cell]
+        while candidates:
+            digit = candidates & -candidates
+            candidates ^= digit
+            first = len(left)
+            headers = [columns[cell]] + [columns[u, digit] for u in cell_units[cell]]
+            for i, header in enumerate(headers):
+                node = first + i
+                left.append(node - 1 if i else first + len(headers) - 1)
+                right.append(node + 1 if i < len(headers) - 1 else first)
+                up.append(up[header])
+                down.append(header)
+                down[up[header]] = node
+                up[header] = node
+                column.append(header)
+                size[header] += 1
+                rows.append((cell, digit))
+    return left, right, up, down, column, size, rows
+
+
+def search(matrix, stats=None, budget=None):
+    """
+    Algorithm X, choosing the column with the fewest rows at every step.
+    Args:
+        matrix(tuple): as returned by build(), modified during the search and restored
+            on failure
+        stats(instrumentation.SolveStats): if given, counts nodes, branches and backtracks
+        budget(bitboard.Budget): if given, limits the search
+    Returns:
+        the row nodes of an exact cover. None if there is none.
+    Raises:
+        bitboard.BudgetExhausted: when the budget runs out
+    """
+
+    left, right, up, down, column, size, rows = matrix
+
+    def cover(c):
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(c):
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    chosen = []
+    while True:
+        if right[0] == 0:
+            return chosen
+        # the column with the fewest rows left
+        c = right[0]
+        best = size[c]
+        j = right[c]
+        while j and best > 1:
+            if size[j] < best:
+                c, best = j, size[j]
+            j = right[j]
+
+        if best:
+            if stats is not None:
+                stats.branch(len(chosen) + 1, rows[down[c]][0], best)
+            cover(c)
+            r = down[c]
+            chosen.append(r)
+            if budget is not None:
+                budget.node()
+            if stats is not None:
+                stats.node(len(chosen), *rows[r])
+            j = right[r]
+            while j != r:
+                cover(column[j])
+                j = right[j]
+            continue
+
+        if stats is not None:
+            stats.contradiction(len(chosen), 0.0)
+        # backtrack to the innermost choice with another row to try
+        while chosen:
+            r = chosen.pop()
+            j = left[r]
+            while j != r:
+                uncover(column[j])
+                j = left[j]
+            c = column[r]
+            r = down[r]
+            if r != c:
+                chosen.append(r)
+                if budget is not None:
+                    budget.node()
+                if stats is not None:
+                    stats.node(len(chosen), *rows[r])
+                j = right[r]
+                while j != r:
+                    cover(column[j])
+                    j = right[j]
+                break
+            uncover(c)
+            if stats is not None:
+                stats.backtrack(len(chosen) + 1)
+        else:
+            return None
+
+
+def solve(board, geometry, stats=None, strategies=(), budget=None):
+    """
+    Solve a board as an exact-cover problem.
+    Args:
+        board(list): candidate masks, modified in place
+        geometry(variants.Geometry): unit and peer tables
+        stats(instrumentation.SolveStats): if given, collects counters and fires its hooks
+        strategies(tuple): further strategies for the propagation before the matrix is built
+        budget(bitboard.Budget): if given, limits the search
+    Returns:
+        the solved board. False if no solution could be found
+    Raises:
+        bitboard.BudgetExhausted: when the budget runs out
+    """
+
+    begin = time.perf_counter() if stats is not None else 0.0
+    if bitboard.propagate(board, geometry, None, None, stats, strategies, budget) is False:
+        if stats is not None:
+            stats.contradiction(0, time.perf_counter() - begin)
+        return False
+    if budget is not None:
+        budget.reduced = board[:]
+    matrix = build(board, geometry)
+    chosen = search(matrix, stats, budget)
+    if chosen is None:
+        return False
+    rows = matrix[6]
+    for node in chosen:
+        cell, digit = rows[node]
+        board[cell] = digit
+    return board
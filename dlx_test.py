@@ -0,0 +1,49 @@
+import unittest
+
+import bitboard
+import dlx
+import instrumentation
+import solution
+import variants
+
+
+class TestDancingLinks(unittest.TestCase):
+    hard_grid = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+    diagonal_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    def test_matches_bitboard(self):
+        for grid, diagonal in ((self.hard_grid, False), (self.unsolvable_grid, False), ('11' + '.' * 79, False),
+                               (self.hard_grid, True)):
+            self.assertEqual(solution.solve(grid, diagonal=diagonal, engine='dlx'),
+                             solution.solve(grid, diagonal=diagonal))
+
+    def test_diagonal_constraints(self):
+        values = solution.solve(self.diagonal_grid, diagonal=True, engine='dlx')
+        for unit in solution.diagonal_geometry.unit_boxes:
+            self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+
+    def test_matrix(self):
+        geometry = solution.classic_geometry
+        board = bitboard.from_values(solution.grid_values('.' * 81), geometry)
+        left, right, up, down, column, size, rows = dlx.build(board, geometry)
+        # a column per cell and per unit and digit, a row of four nodes per candidate
+        self.assertEqual(len(size), 1 + 81 + 27 * 9)
+        self.assertEqual(len(left), len(size) + 729 * 4)
+        self.assertEqual(set(size[1:]), {9})
+
+    def test_variants(self):
+        for geometry in (variants.variant('windoku'), variants.variant('classic', 16)):
+            values = solution.solve('.' * len(geometry.boxes), variant=geometry, engine='dlx')
+            for unit in geometry.unit_boxes:
+                self.assertEqual(sorted(values[box] for box in unit), sorted(geometry.digits))
+
+    def test_stats(self):
+        stats = instrumentation.SolveStats()
+        solution.solve(self.hard_grid, diagonal=False, engine='dlx', stats=stats)
+        self.assertGreater(stats.nodes, 0)
+        self.assertRaises(ValueError, solution.solve, self.hard_grid, engine='nope')
+
+
+if __name__ == '__main__':
+    unittest.main()
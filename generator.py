@@ -0,0 +1,230 @@
+"""
+Puzzle generator with guaranteed uniqueness and difficulty grades.
+
+generate() fills an empty board with a random solution, then takes clues away one at a
+time in random order and keeps every removal after which the solution is still unique.
+A clue the puzzle needs stays needed when more clues are taken away, so every cell is
+tried once and the result is minimal.
+
+Uniqueness is checked on the candidate masks the generator already holds, without going
+through strings, dictionaries or solve(). Without the clue at a cell, the puzzle is
+still unique exactly when the remaining clues with any *other* digit at that cell have
+no solution, so one refutation search by bitboard.search_in_place() settles it. Most of
+these end in the propagation the search starts with. When the grade is capped at
+'easy' or 'medium', propagation alone decides: a board it solves has a unique solution.
+
+Puzzles are graded by what it takes to solve them:
+    easy        eliminate and only_choice (singles)
+    medium      full propagation, naked twins included
+    hard        search, with at most HARD_NODES nodes
+    fiendish    search with more nodes
+"""
+import collections
+import concurrent.futures
+import os
+import random
+
+import bitboard
+import solution
+from instrumentation import SolveStats
+
+GRADES = ('easy', 'medium', 'hard', 'fiendish')
+# most search nodes for a 'hard' puzzle
+HARD_NODES = 4
+# random solutions tried before generate() gives up on a grade
+MAX_ATTEMPTS = 100
+
+Puzzle = collections.namedtuple('Puzzle', 'grid solution grade nodes')
+Puzzle.__doc__ = """
+A generated puzzle.
+    grid(string): the clues, '.' for empty boxes
+    solution(string): its only solution
+    grade(string): one of GRADES
+    nodes(int): search nodes needed to solve it, 0 below 'hard'
+"""
+
+
+class GenerationError(Exception):
+    """Raised when no puzzle of the requested grade turned up within the allowed attempts."""
+
+
+def random_solution(geometry, rng=random):
+    """
+    A random solved board.
+    Args:
+        geometry(variants.Geometry): the rules and size of the board
+        rng(random.Random): source of randomness
+    Returns:
+        the board as a list of single-digit masks
+    """
+
+    def shuffled(board, geometry, cell):
+        digits = bitboard.ascending(board, geometry, cell)
+        rng.shuffle(digits)
+        return digits
+
+    board = [geometry.all_digits] * len(geometry.boxes)
+    return bitboard.search_in_place(board, geometry, value_order=shuffled)
+
+
+def _solved_by_singles(board, geometry):
+    """Apply eliminate and only_choice to a consistent board until they stall; True if it is solved."""
+    popcount = geometry.popcount
+    left = sum(popcount[mask] for mask in board)
+    while True:
+        if bitboard.only_choice(bitboard.eliminate(board, geometry), geometry) is False:
+            return False
+        now = sum(popcount[mask] for mask in board)
+        if now == left:
+            return now == len(board)
+        left = now
+
+
+def _solved_by_propagation(board, geometry):
+    """Propagate a board; True if that solves it."""
+    popcount = geometry.popcount
+    return (bitboard.propagate(board, geometry) is not False
+            and all(popcount[mask] == 1 for mask in board))
+
+
+def _grade(clues, geometry):
+    """
+    Grade a puzzle with a unique solution.
+    Returns:
+        (grade, search nodes)
+    """
+
+    if _solved_by_singles(clues[:], geometry):
+        return 'easy', 0
+    if _solved_by_propagation(clues[:], geometry):
+        return 'medium', 0
+    stats = SolveStats()
+    bitboard.search_in_place(clues[:], geometry, stats=stats)
+    return ('hard' if stats.nodes <= HARD_NODES else 'fiendish'), stats.nodes
+
+
+def _remove_clues(solved, geometry, rng, ceiling=None):
+    """
+    Take clues away from a solved board while the solution stays unique.
+    Args:
+        solved(list): a solved board
+        geometry(variants.Geometry): its rules
+        rng(random.Random): decides the order cells are tried in
+        ceiling(string): 'easy' or 'medium' only keeps removals after which the puzzle is
+            still solved by singles or by propagation. Default: no limit.
+    Returns:
+        the clues as a board, with all_digits for empty boxes
+    """
+
+    all_digits = geometry.all_digits
+    clues = solved[:]
+    cells = list(range(len(clues)))
+    rng.shuffle(cells)
+    for cell in cells:
+        digit = clues[cell]
+        clues[cell] = all_digits
+        if ceiling == 'easy':
+            unique = _solved_by_singles(clues[:], geometry)
+        elif ceiling == 'medium':
+            unique = _solved_by_propagation(clues[:], geometry)
+        else:
+            # built from the raw clues every time: the propagated board of the current clues
+            # holds deductions from this clue, so it can't be reused once the clue is gone
+            trial = clues[:]
+            trial[cell] = all_digits & ~digit
+            unique = bitboard.search_in_place(trial, geometry) is False
+        if not unique:
+            clues[cell] = digit
+    return clues
+
+
+def _grid(board, geometry):
+    popcount = geometry.popcount
+    mask_digits = geometry.mask_digits
+    return ''.join(mask_digits[mask] if popcount[mask] == 1 else '.' for mask in board)
+
+
+def grade(grid, diagonal=None, variant=None):
+    """
+    Grade a puzzle by what it takes to solve it.
+    Args:
+        grid(string): a sudoku grid with a unique solution
+        diagonal, variant: as for solution.solve()
+    Returns:
+        (grade, search nodes): the grade is one of GRADES
+    """
+
+    rules = solution.get_variant(variant, diagonal)
+    return _grade(bitboard.from_values(solution.grid_values(grid, rules), rules), rules)
+
+
+def generate(difficulty=None, diagonal=None, variant=None, seed=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Generate a minimal puzzle with a unique solution.
+    Args:
+        difficulty(string): one of GRADES. Default: whatever grade comes out.
+        diagonal, variant: as for solution.solve()
+        seed: seeds the random number generator, for reproducible puzzles
+        max_attempts(int): random solutions to try before giving up on `difficulty`
+    Returns:
+        a Puzzle
+    Raises:
+        ValueError: for an unknown difficulty
+        GenerationError: if no puzzle of the requested grade was found
+    """
+
+    if difficulty is not None and difficulty not in GRADES:
+        raise ValueError('unknown difficulty {!r}, expected one of {}'.format(difficulty, GRADES))
+    rules = solution.get_variant(variant, diagonal)
+    rng = random.Random(seed)
+    # the easy grades are enforced while removing clues, the hard ones by retrying
+    ceiling = difficulty if difficulty in ('easy', 'medium') else None
+    for attempt in range(max_attempts):
+        solved = random_solution(rules, rng)
+        clues = _remove_clues(solved, rules, rng, ceiling)
+        found, nodes = _grade(clues, rules)
+        if difficulty is None or found == difficulty:
+            return Puzzle(_grid(clues, rules), _grid(solved, rules), found, nodes)
+    raise GenerationError('no {} puzzle in {} attempts'.format(difficulty, max_attempts))
+
+
+def generate_chunk(start, stop, seed=None, options=None):
+    """
+    Generate the puzzles numbered start to stop - 1.
+    Puzzle i is seeded with `seed` and i, so the same seed gives the same puzzles
+    however they are split between workers.
+    Returns:
+        a list of Puzzle
+    """
+
+    options = options or {}
+    return [generate(seed=None if seed is None else '{}:{}'.format(seed, index), **options)
+            for index in range(start, stop)]
+
+
+def generate_many(count, workers=None, chunksize=8, seed=None, **options):
+    """
+    Generate many puzzles on a process pool.
+    Args:
+        count(int): number of puzzles
+        workers(int): number of worker processes. 0 generates in this process.
+            Default: one per CPU.
+        chunksize(int): puzzles generated by a worker at a time
+        seed: if given, makes the puzzles reproducible
+        options: passed on to generate(), e.g. difficulty='hard' or diagonal=False
+    Returns:
+        an iterator of Puzzle, in order
+    """
+
+    chunks = [(start, min(start + chunksize, count)) for start in range(0, count, chunksize)]
+    if workers == 0:
+        for start, stop in chunks:
+            for puzzle in generate_chunk(start, stop, seed, options):
+                yield puzzle
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(generate_chunk, start, stop, seed, options) for start, stop in chunks]
+        for future in futures:
+            for puzzle in future.result():
+                yield puzzle
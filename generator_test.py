@@ -0,0 +1,55 @@
+import unittest
+
+import generator
+import solution
+import variants
+
+
+class TestGenerator(unittest.TestCase):
+
+    def assertPuzzle(self, puzzle, diagonal):
+        self.assertEqual(solution.classify(puzzle.grid, diagonal=diagonal), 'unique')
+        self.assertEqual(solution.grid_string(solution.solve(puzzle.grid, diagonal=diagonal)), puzzle.solution)
+        for clue, digit in zip(puzzle.grid, puzzle.solution):
+            self.assertIn(clue, ('.', digit))
+        self.assertEqual(generator.grade(puzzle.grid, diagonal=diagonal), (puzzle.grade, puzzle.nodes))
+
+    def test_random_solution(self):
+        geometry = variants.variant('diagonal')
+        values = solution.grid_values(generator._grid(generator.random_solution(geometry), geometry), geometry)
+        for unit in geometry.unit_boxes:
+            self.assertEqual(sorted(values[box] for box in unit), list(geometry.digits))
+
+    def test_unique(self):
+        for diagonal in (False, True):
+            self.assertPuzzle(generator.generate(diagonal=diagonal, seed=1), diagonal)
+
+    def test_minimal(self):
+        puzzle = generator.generate(diagonal=False, seed=2)
+        for cell, clue in enumerate(puzzle.grid):
+            if clue != '.':
+                grid = puzzle.grid[:cell] + '.' + puzzle.grid[cell + 1:]
+                self.assertEqual(solution.classify(grid, diagonal=False), 'multiple')
+
+    def test_difficulty(self):
+        for difficulty in generator.GRADES:
+            puzzle = generator.generate(difficulty, diagonal=False, seed=3)
+            self.assertEqual(puzzle.grade, difficulty)
+            self.assertPuzzle(puzzle, False)
+        self.assertRaises(ValueError, generator.generate, 'impossible')
+        self.assertRaises(generator.GenerationError, generator.generate, 'fiendish', seed=3, max_attempts=0)
+
+    def test_other_variants(self):
+        geometry = variants.variant('windoku', 4)
+        puzzle = generator.generate(variant=geometry, seed=4)
+        self.assertEqual(solution.classify(puzzle.grid, variant=geometry), 'unique')
+
+    def test_generate_many(self):
+        puzzles = list(generator.generate_many(5, workers=0, chunksize=2, seed=5, diagonal=False))
+        self.assertEqual(len(puzzles), 5)
+        self.assertEqual(list(generator.generate_many(5, workers=2, chunksize=3, seed=5, diagonal=False)), puzzles)
+        self.assertEqual(puzzles[4], generator.generate(diagonal=False, seed='5:4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Optional per-solve statistics and tracing hooks.
+
+Pass a SolveStats to solution.solve() (or use solution.solve_with_stats()) to find out
+where a solve spends its time. When no SolveStats is given the solver skips all of this:
+propagate() takes its uninstrumented path and the search only tests for None.
+"""
+import collections
+import time
+
+# events that hooks can subscribe to, and the arguments passed to their callbacks
+EVENTS = {
+    'branch': '(depth, cell, candidates)',
+    'node': '(depth, cell, digit mask)',
+    'contradiction': '(depth, seconds spent propagating)',
+    'backtrack': '(depth)',
+    'done': '(stats)',
+}
+
+
+class SolveStats:
+    """
+    Counters and timings of one solve.
+    Attributes:
+        removed(dict): candidates removed per strategy
+        strategy_time(dict): seconds spent per strategy
+        propagations(int): propagate() calls
+        unit_visits(int): units taken off the propagation worklist
+        nodes(int): candidates tried by the search
+        branches(int): branching cells chosen, branch_candidates the candidates they had
+        backtracks(int): branching cells whose candidates all failed
+        contradictions(int): propagations that ended in a contradiction, and
+            contradiction_time the seconds they took
+        max_depth(int): deepest branching level reached
+        total_time(float): seconds for the whole solve
+    """
+
+    def __init__(self):
+        self.removed = collections.defaultdict(int)
+        self.strategy_time = collections.defaultdict(float)
+        self.propagations = 0
+        self.unit_visits = 0
+        self.nodes = 0
+        self.branches = 0
+        self.branch_candidates = 0
+        self.backtracks = 0
+        self.contradictions = 0
+        self.contradiction_time = 0.0
+        self.max_depth = 0
+        self.total_time = 0.0
+        self.hooks = collections.defaultdict(list)
+        self.current = None
+        self._since = 0.0
+
+    def add_hook(self, event, callback):
+        """
+        Call `callback` on every `event`; see EVENTS for the arguments.
+        """
+        if event not in EVENTS:
+            raise ValueError('unknown event {!r}, expected one of {}'.format(event, sorted(EVENTS)))
+        self.hooks[event].append(callback)
+
+    def emit(self, event, *args):
+        for callback in self.hooks.get(event, ()):
+            callback(*args)
+
+    def switch(self, strategy):
+        """Charge the time since the last switch to the current strategy and move on to `strategy`."""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.strategy_time[self.current] += now - self._since
+        self.current = strategy
+        self._since = now
+
+    def branch(self, depth, cell, candidates):
+        self.branches += 1
+        self.branch_candidates += candidates
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self.emit('branch', depth, cell, candidates)
+
+    def node(self, depth, cell, digit):
+        self.nodes += 1
+        self.emit('node', depth, cell, digit)
+
+    def contradiction(self, depth, seconds):
+        self.contradictions += 1
+        self.contradiction_time += seconds
+        self.emit('contradiction', depth, seconds)
+
+    def backtrack(self, depth):
+        self.backtracks += 1
+        self.emit('backtrack', depth)
+
+    def done(self, seconds):
+        self.total_time = seconds
+        self.emit('done', self)
+
+    @property
+    def branching_factor(self):
+        """Average number of candidates at the branching cells."""
+        return self.branch_candidates / self.branches if self.branches else 0.0
+
+    def as_dict(self):
+        """The statistics as a JSON-serializable dictionary."""
+        return {'removed': dict(self.removed),
+                'strategy_time': dict(self.strategy_time),
+                'propagations': self.propagations,
+                'unit_visits': self.unit_visits,
+                'nodes': self.nodes,
+                'branches': self.branches,
+                'branching_factor': self.branching_factor,
+                'backtracks': self.backtracks,
+                'contradictions': self.contradictions,
+                'contradiction_time': self.contradiction_time,
+                'max_depth': self.max_depth,
+                'total_time': self.total_time}
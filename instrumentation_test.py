@@ -0,0 +1,40 @@
+import instrumentation
+import solution
+import unittest
+
+
+class TestSolveStats(unittest.TestCase):
+    hard_grid = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    def test_counters(self):
+        for search_mode in solution.search_modes:
+            values, stats = solution.solve_with_stats(self.hard_grid, diagonal=False, search_mode=search_mode)
+            self.assertEqual(values, solution.solve(self.hard_grid, diagonal=False))
+            self.assertGreater(stats.removed['eliminate'], 0)
+            self.assertGreater(stats.removed['only_choice'], 0)
+            self.assertGreater(stats.nodes, 0)
+            self.assertGreaterEqual(stats.max_depth, 1)
+            self.assertGreaterEqual(stats.branching_factor, 2)
+            self.assertGreaterEqual(stats.total_time, sum(stats.strategy_time.values()))
+
+    def test_unsolvable(self):
+        values, stats = solution.solve_with_stats(self.unsolvable_grid, diagonal=False)
+        self.assertFalse(values)
+        self.assertGreater(stats.contradictions, 0)
+        self.assertGreater(stats.backtracks, 0)
+        self.assertIn('contradiction_time', stats.as_dict())
+
+    def test_hooks(self):
+        events = []
+        stats = instrumentation.SolveStats()
+        stats.add_hook('node', lambda depth, cell, digit: events.append(('node', depth)))
+        stats.add_hook('done', lambda done: events.append(('done', done is stats)))
+        solution.solve(self.hard_grid, diagonal=False, stats=stats)
+        self.assertEqual(len([event for event in events if event[0] == 'node']), stats.nodes)
+        self.assertEqual(events[-1], ('done', True))
+        self.assertRaises(ValueError, stats.add_hook, 'nope', print)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Load generator for service.py.
+
+Usage: python loadgen.py [--host HOST --port PORT | --unix PATH | --spawn WORKERS]
+                         [--corpus FILE] [-n COUNT] [-c CONNECTIONS] [-d DEPTH]
+
+Sends COUNT solve requests, cycling through the puzzles of a corpus file, over
+CONNECTIONS connections that each keep up to DEPTH requests pipelined, and reports the
+throughput, the latency percentiles seen by the client and the replies by status. With
+--spawn it starts a service with that many workers in this process first, on a free
+port, so a single command measures the whole path.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import sys
+import time
+
+import benchmark
+import service
+
+Report = collections.namedtuple('Report', 'count seconds statuses latencies')
+
+
+async def _connection(connect, requests, depth, statuses, latencies):
+    """Send a list of (id, request) pairs over one connection, with at most `depth` unanswered."""
+    reader, writer = await connect()
+    sent = {}
+    window = asyncio.Semaphore(depth)
+
+    async def send():
+        for request_id, request in requests:
+            await window.acquire()
+            sent[request_id] = time.perf_counter()
+            writer.write(json.dumps(dict(request, id=request_id)).encode() + b'\n')
+            await writer.drain()
+
+    async def receive():
+        for reply in range(len(requests)):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('the service closed the connection')
+            reply = json.loads(line)
+            begin = sent.pop(reply.get('id'), None)
+            if begin is None:
+                # e.g. an error about a request the service couldn't read, with id null
+                statuses['error'] += 1
+            else:
+                latencies.append(time.perf_counter() - begin)
+                statuses[reply['status']] += 1
+            window.release()
+
+    try:
+        await asyncio.gather(send(), receive())
+    finally:
+        writer.close()
+
+
+async def run(connect, grids, count, connections=4, depth=8, options=None):
+    """
+    Put load on a service.
+    Args:
+        connect(function): coroutine function returning a (reader, writer) pair
+        grids(list): puzzles to send, cycled through
+        count(int): requests to send in all, dealt out to the connections in turn
+        connections(int): connections opened at once
+        depth(int): requests pipelined on each connection
+        options(dict): further fields for every request, e.g. {'diagonal': False}
+    Returns:
+        a Report
+    """
+
+    requests = list(enumerate(dict(options or {}, grid=grid)
+                              for grid in itertools.islice(itertools.cycle(grids), count)))
+    statuses = collections.Counter()
+    latencies = []
+    begin = time.perf_counter()
+    await asyncio.gather(*(_connection(connect, requests[i::connections], depth, statuses, latencies)
+                           for i in range(connections)))
+    return Report(count, time.perf_counter() - begin, statuses, sorted(latencies))
+
+
+def report(result):
+    """Format a Report."""
+    latencies = result.latencies or [0.0]
+    return '{} requests in {:.2f}s, {:.1f} requests/sec, latency ms p50 {:.3f} p90 {:.3f} p99 {:.3f}, {}'.format(
+        result.count, result.seconds, result.count / result.seconds if result.seconds else 0.0,
+        benchmark.percentile(latencies, 0.5) * 1000, benchmark.percentile(latencies, 0.9) * 1000,
+        benchmark.percentile(latencies, 0.99) * 1000,
+        ', '.join('{} {}'.format(status, n) for status, n in sorted(result.statuses.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solve service under concurrent load.')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--port', type=int, help='TCP port of a running service')
+    target.add_argument('--unix', help='Unix socket of a running service')
+    target.add_argument('--spawn', type=int, metavar='WORKERS',
+                        help='start a service with this many workers here (default: one per CPU)')
+    parser.add_argument('--host', default='127.0.0.1', help='address of the service')
+    parser.add_argument('--corpus', default=os.path.join(benchmark.PUZZLE_DIR, 'easy.txt'),
+                        help='puzzle file, one puzzle per line')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='requests to send')
+    parser.add_argument('-c', '--connections', type=int, default=4, help='connections at once')
+    parser.add_argument('-d', '--depth', type=int, default=8, help='requests pipelined per connection')
+    args = parser.parse_args(argv)
+
+    corpus = benchmark.load_corpus(args.corpus)
+    options = {'diagonal': corpus.diagonal}
+
+    async def load():
+        spawned = None
+        if args.unix:
+            connect = lambda: asyncio.open_unix_connection(args.unix)
+        elif args.port:
+            connect = lambda: asyncio.open_connection(args.host, args.port)
+        else:
+            spawned = service.Service(args.spawn)
+            port = (await spawned.start(args.host, 0)).sockets[0].getsockname()[1]
+            connect = lambda: asyncio.open_connection(args.host, port)
+        try:
+            return await run(connect, corpus.grids, args.count, args.connections, args.depth, options)
+        finally:
+            if spawned is not None:
+                await spawned.close()
+
+    print(report(asyncio.run(load())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Parallel search of a single puzzle.
+
+batch.py spreads many puzzles over a process pool, which doesn't help when one very hard
+puzzle or one large grid is the problem. Here the search tree of a single puzzle is split
+instead: split() expands the tree breadth first from the propagated root until there are
+enough open subproblems, and the pool works through them. The pool's shared task queue
+balances the load, since an idle worker takes the next subproblem as soon as it is done,
+and there are several subproblems per worker so that one deep subtree doesn't leave
+the others idle.
+
+Finding a solution sets a multiprocessing Event shared by the workers. They check it
+every CHECK_INTERVAL branches and give up their subtree, and subproblems not yet started
+are cancelled. In counting mode the counts of the subtrees are added up, and the Event
+stops the search once the limit is reached.
+"""
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+
+import bitboard
+import deduction
+import solution
+
+# open subproblems per worker that split() aims for
+SUBPROBLEMS_PER_WORKER = 8
+# branches between two checks of the cancellation Event
+CHECK_INTERVAL = 64
+
+# the cancellation Event, set in each worker by _start_worker()
+_cancel = None
+
+
+class Cancelled(Exception):
+    """Raised inside a worker when another worker has finished the search."""
+
+
+def _start_worker(event):
+    global _cancel
+    _cancel = event
+
+
+def _cancellable(value_order):
+    """Wrap a value-ordering heuristic, which runs once per branch, to also check the cancellation Event."""
+    branches = [0]
+
+    def order(board, geometry, cell):
+        branches[0] += 1
+        if branches[0] % CHECK_INTERVAL == 0 and _cancel is not None and _cancel.is_set():
+            raise Cancelled()
+        return value_order(board, geometry, cell)
+    return order
+
+
+def split(board, geometry, count, strategies=()):
+    """
+    Expand the search tree breadth first into open subproblems.
+    Args:
+        board(list): candidate masks, modified in place
+        geometry(variants.Geometry): unit and peer tables
+        count(int): stop once there are this many open subproblems
+        strategies(tuple): further strategies for propagate()
+    Returns:
+        (open subproblems, solved boards found on the way), both lists of boards
+    """
+
+    popcount = geometry.popcount
+    if bitboard.propagate(board, geometry, None, None, None, strategies) is False:
+        return [], []
+    queue = collections.deque([board])
+    solved = []
+    if all(popcount[mask] == 1 for mask in board):
+        return [], [board]
+    while queue and len(queue) < count:
+        board = queue.popleft()
+        best = None
+        best_count = geometry.size + 1
+        for cell, mask in enumerate(board):
+            if 1 < popcount[mask] < best_count:
+                best, best_count = cell, popcount[mask]
+        for digit in bitboard.ascending(board, geometry, best):
+            child = board[:]
+            child[best] = digit
+            if bitboard.propagate(child, geometry, [best], None, None, strategies) is False:
+                continue
+            if all(popcount[mask] == 1 for mask in child):
+                solved.append(child)
+            else:
+                queue.append(child)
+    return list(queue), solved
+
+
+def search_subproblem(board, geometry, limit=1, strategies=()):
+    """
+    Search one subproblem, as a worker does.
+    Args:
+        board(list): a propagated board from split()
+        geometry(variants.Geometry): unit and peer tables
+        limit(int): stop after this many solutions. None counts them all.
+        strategies(tuple): further strategies for propagate()
+    Returns:
+        (number of solutions found, the first of them or None). (0, None) if cancelled.
+    """
+
+    count = 0
+    first = None
+    try:
+        for solved in bitboard.iter_in_place(board, geometry, bitboard.first_cell,
+                                             _cancellable(bitboard.ascending), None, None, strategies):
+            if first is None:
+                first = solved[:]
+            count += 1
+            if count == limit:
+                break
+    except Cancelled:
+        return 0, None
+    return count, first
+
+
+class ParallelSolver:
+    """
+    A process pool for the parallel search of single puzzles, one at a time.
+    Args:
+        workers(int): number of worker processes. 0 searches the subproblems in this
+            process, one after the other. Default: one per CPU.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.cancel = multiprocessing.Event()
+        self.executor = None
+        if self.workers:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_start_worker,
+                                                                   initargs=(self.cancel,))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _search(self, grid, limit, diagonal, variant, strategies):
+        """
+        Split a grid and search the subproblems until `limit` solutions are found.
+        Returns:
+            (number of solutions, at most `limit`; the first solution found as a board or
+            None; the geometry)
+        """
+
+        rules = solution.get_variant(variant, diagonal)
+        strategies = deduction.resolve(strategies)
+        board = bitboard.from_values(solution.grid_values(grid, rules), rules)
+        subproblems, solved = split(board, rules, max(self.workers, 1) * SUBPROBLEMS_PER_WORKER, strategies)
+        count = len(solved)
+        first = solved[0] if solved else None
+        if limit is not None and count >= limit:
+            return limit, first, rules
+
+        if self.executor is None:
+            for board in subproblems:
+                found, board = search_subproblem(board, rules, None if limit is None else limit - count,
+                                                 strategies)
+                count += found
+                first = first or board
+                if limit is not None and count >= limit:
+                    break
+            return count, first, rules
+
+        remaining = None if limit is None else limit - count
+        futures = [self.executor.submit(search_subproblem, board, rules, remaining, strategies)
+                   for board in subproblems]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                found, board = future.result()
+                count += found
+                first = first or board
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            # stop the workers still searching and drop the subproblems not started
+            self.cancel.set()
+            for future in futures:
+                future.cancel()
+            concurrent.futures.wait(futures)
+            self.cancel.clear()
+        return min(count, limit) if limit is not None else count, first, rules
+
+    def solve(self, grid, diagonal=None, variant=None, strategies=None):
+        """
+        Find a solution of a grid, searching its subtrees in parallel.
+        Args:
+            grid(string): a sudoku grid
+            diagonal, variant, strategies: as for solution.solve()
+        Returns:
+            a solution in dictionary form, not necessarily the one solution.solve() finds
+            first if there are several. False if there is none.
+        """
+
+        count, first, rules = self._search(grid, 1, diagonal, variant, strategies)
+        if first is None:
+            return False
+        return bitboard.to_values(first, rules)
+
+    def count_solutions(self, grid, limit=2, diagonal=None, variant=None, strategies=None):
+        """
+        Count the solutions of a grid, searching its subtrees in parallel.
+        Args:
+            grid(string): a sudoku grid
+            limit(int): the most solutions to look for. None counts them all.
+            diagonal, variant, strategies: as for solution.solve()
+        Returns:
+            the number of solutions, at most `limit`
+        """
+
+        return self._search(grid, limit, diagonal, variant, strategies)[0]
+
+
+def solve(grid, workers=None, **options):
+    """ParallelSolver(workers).solve(grid, **options) on a pool started for this call."""
+    with ParallelSolver(workers) as solver:
+        return solver.solve(grid, **options)
+
+
+def count_solutions(grid, limit=2, workers=None, **options):
+    """ParallelSolver(workers).count_solutions(grid, limit, **options) on a pool started for this call."""
+    with ParallelSolver(workers) as solver:
+        return solver.count_solutions(grid, limit, **options)
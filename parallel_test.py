@@ -0,0 +1,64 @@
+import unittest
+
+import benchmark
+import parallel
+import solution
+import variants
+
+
+class TestParallel(unittest.TestCase):
+    # 384 solutions: the first 30 boxes of a grid with two solutions cleared
+    open_grid = '.' * 30 + '437169791586432346912758289643571573291684164875293'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = parallel.ParallelSolver(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.solver.close()
+
+    def test_solve(self):
+        for grid in benchmark.bundled_corpora()['hard'].grids[:5]:
+            self.assertEqual(self.solver.solve(grid, diagonal=False), solution.solve(grid, diagonal=False))
+        self.assertIs(self.solver.solve(self.unsolvable_grid, diagonal=False), False)
+        # several solutions: any of them will do
+        grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+        answer = solution.grid_string(self.solver.solve(grid, diagonal=True))
+        self.assertEqual(solution.classify(answer, diagonal=True), 'unique')
+        for clue, digit in zip(grid, answer):
+            self.assertIn(clue, ('.', digit))
+
+    def test_count(self):
+        self.assertEqual(self.solver.count_solutions(self.open_grid, None, diagonal=False), 384)
+        self.assertEqual(self.solver.count_solutions(self.open_grid, 100, diagonal=False), 100)
+        self.assertEqual(self.solver.count_solutions(self.unsolvable_grid, None, diagonal=False), 0)
+        self.assertEqual(self.solver.count_solutions('.' * 16, None, variant=variants.variant('classic', 4)), 288)
+
+    def test_cancellation(self):
+        # the empty grid has far too many solutions to search through, so this only returns
+        # because the workers are stopped once the limit is reached
+        self.assertEqual(self.solver.count_solutions('.' * 81, 1000, diagonal=False), 1000)
+        values = self.solver.solve('.' * 81, diagonal=True)
+        self.assertEqual(solution.classify(solution.grid_string(values), diagonal=True), 'unique')
+        # and the pool is ready for the next puzzle
+        self.assertEqual(self.solver.count_solutions(self.open_grid, None, diagonal=False), 384)
+
+    def test_in_process(self):
+        self.assertEqual(parallel.count_solutions(self.open_grid, None, workers=0, diagonal=False), 384)
+        grid = benchmark.bundled_corpora()['hard'].grids[0]
+        self.assertEqual(parallel.solve(grid, workers=0, diagonal=False, strategies='all'),
+                         solution.solve(grid, diagonal=False))
+
+    def test_split(self):
+        geometry = solution.classic_geometry
+        board = solution.bitboard.from_values(solution.grid_values(self.open_grid, geometry), geometry)
+        subproblems, solved = parallel.split(board, geometry, 16)
+        self.assertGreaterEqual(len(subproblems), 16)
+        self.assertEqual(sum(parallel.search_subproblem(board, geometry, None)[0] for board in subproblems)
+                         + len(solved), 384)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Opt-in recording of solver progress for visualization.
+
+Nothing is recorded unless a recorder is passed to solve() or to the dictionary
+strategies in solution.py. A recorder keeps compact (cell, old mask, new mask) deltas
+in a ring buffer of bounded size and rebuilds full boards only when frames() is called.
+"""
+import collections
+
+import bitboard
+
+
+class AssignmentRecorder:
+    """
+    Bounded log of board changes.
+    Args:
+        geometry(variants.Geometry): box order of the recorded boards
+        maxlen(int): number of deltas kept. The oldest ones are folded into the
+            starting board once the buffer is full. None keeps everything.
+    """
+
+    def __init__(self, geometry, maxlen=100000):
+        self.geometry = geometry
+        self.maxlen = maxlen
+        self.deltas = collections.deque()
+        # the board before the oldest kept delta, and the board after the newest one
+        self.base = None
+        self.current = None
+
+    def start(self, board):
+        """Begin a recording from a board of candidate masks."""
+        self.base = list(board)
+        self.current = list(board)
+        self.deltas.clear()
+
+    def start_values(self, values):
+        """Begin a recording from a sudoku in dictionary form."""
+        self.start(bitboard.from_values(values, self.geometry))
+
+    def record(self, cell, old, new):
+        """Record that a cell changed from mask `old` to mask `new`."""
+        if self.current is None:
+            self.start([self.geometry.all_digits] * len(self.geometry.boxes))
+        if self.maxlen is not None and len(self.deltas) >= self.maxlen:
+            oldest_cell, oldest_old, oldest_new = self.deltas.popleft()
+            self.base[oldest_cell] = oldest_new
+        self.deltas.append((cell, old, new))
+        self.current[cell] = new
+
+    def record_value(self, box, old, new):
+        """Record a change made to a sudoku in dictionary form."""
+        self.record(self.geometry.index[box], bitboard.to_mask(old, self.geometry),
+                    bitboard.to_mask(new, self.geometry))
+
+    def sync_values(self, values):
+        """
+        Record whatever changes turn the last recorded board into `values`, e.g. when a
+        search continues from a different copy of the board.
+        """
+        if self.current is None:
+            self.start_values(values)
+            return
+        for cell, box in enumerate(self.geometry.boxes):
+            mask = bitboard.to_mask(values[box], self.geometry)
+            if self.current[cell] != mask:
+                self.record(cell, self.current[cell], mask)
+
+    def frames(self):
+        """
+        Rebuild the recorded boards.
+        Returns:
+            an iterator of sudokus in dictionary form, one for every change that left a
+            box with a single value, like the assignments list visualize_assignments expects
+        """
+
+        if self.base is None:
+            return
+        popcount = self.geometry.popcount
+        board = list(self.base)
+        for cell, old, new in self.deltas:
+            board[cell] = new
+            if popcount[new] == 1:
+                yield bitboard.to_values(board, self.geometry)
+
+
+def changed_frames(assignments):
+    """
+    Drop the frames that assign nothing new, as visualize_assignments does, comparing each
+    frame with the one before it box by box instead of building sets of their items.
+    Args:
+        assignments(iterable): sudokus in dictionary form
+    Returns:
+        an iterator of the frames after the first with a single value in a box that didn't
+        hold it in the frame before
+    """
+
+    last = None
+    for values in assignments:
+        if last is not None and any(len(value) == 1 and last.get(box) != value for box, value in values.items()):
+            yield values
+        last = values
@@ -0,0 +1,58 @@
+import recording
+import solution
+import unittest
+
+
+class TestAssignmentRecorder(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    hard_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+
+    def test_solve_frames(self):
+        for grid in (self.diagonal_grid, self.hard_grid):
+            recorder = recording.AssignmentRecorder(solution.geometry)
+            values = solution.solve(grid, recorder=recorder)
+            frames = list(recorder.frames())
+            self.assertTrue(frames)
+            self.assertEqual(frames[-1], values)
+            self.assertTrue(all(len(frame) == 81 for frame in frames))
+
+    def test_bounded(self):
+        recorder = recording.AssignmentRecorder(solution.geometry, maxlen=50)
+        values = solution.solve(self.hard_grid, recorder=recorder)
+        self.assertEqual(len(recorder.deltas), 50)
+        self.assertEqual(list(recorder.frames())[-1], values)
+
+    def test_dict_search(self):
+        recorder = recording.AssignmentRecorder(solution.geometry)
+        values = solution.grid_values(self.hard_grid)
+        recorder.start_values(values)
+        values = solution.search(values, recorder)
+        self.assertEqual(list(recorder.frames())[-1], values)
+
+    def test_copy_mode_cannot_record(self):
+        recorder = recording.AssignmentRecorder(solution.geometry)
+        self.assertRaises(ValueError, solution.solve, self.diagonal_grid, 'copy', recorder=recorder)
+
+    def test_changed_frames(self):
+        def filtered(assignments):
+            # the filter of visualize.visualize_assignments, which imports pygame
+            kept = []
+            for last, current in zip(assignments, assignments[1:]):
+                last_items = [item for item in last.items() if len(item[1]) == 1]
+                current_items = [item for item in current.items() if len(item[1]) == 1]
+                if len(set(last_items) & set(current_items)) < len(current_items):
+                    kept.append(current)
+            return kept
+
+        recorder = recording.AssignmentRecorder(solution.geometry)
+        solution.solve(self.hard_grid, recorder=recorder)
+        frames = list(recorder.frames())
+        # a repeated frame and a frame that only widens a box are both dropped
+        frames[5:5] = [frames[4], dict(frames[4], A1='123')]
+        self.assertEqual(list(recording.changed_frames(frames)), filtered(frames))
+        self.assertEqual(list(recording.changed_frames(iter(frames))), filtered(frames))
+        self.assertEqual(list(recording.changed_frames([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+"""
+Cached, dirty-rect renderer for replays of a solve, with headless export.
+
+PySudoku.play() builds 81 SudokuSquare objects for every frame. Each one looks up its
+font and renders its digit again, and draws its rounded tile by allocating and
+smoothscaling new surfaces. Renderer draws the same picture from assets made once: the
+font, one glyph per digit, and the image of each cell with each digit, composed the first
+time it is needed. It remembers the digit shown in every cell, redraws only the cells
+that changed and returns their rectangles for pygame.display.update().
+
+play() replays frames in a window like PySudoku.play(). export() needs no display: it
+renders through SDL's dummy video driver to a directory of numbered PNG files, or to an
+animated GIF at a given frame rate. The GIF needs Pillow, which also writes PNG files
+faster than pygame when it is installed.
+
+Usage: python renderer.py [--diagonal | --standard] [--fps FPS] GRID OUTPUT
+
+pygame is optional for the rest of the solver; it is only imported here.
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+
+import pygame
+
+import recording
+import solution
+from objects.SudokuSquare import AAfilledRoundedRect
+
+SIZE = (700, 700)
+BACKGROUND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images', 'sudoku-board-bare.jpg')
+ROWS = 'ABCDEFGHI'
+COLS = '123456789'
+# the look of objects/SudokuSquare.py: a tile per cell, teal once solved, with a white digit
+TILE_SIZE = (45, 40)
+GLYPH_OFFSET = (17, 4)
+SOLVED_COLOR = (2, 204, 186)
+EMPTY_COLOR = (255, 255, 255)
+TEXT_COLOR = (255, 255, 255)
+FONT = ('opensans', 21)
+
+
+def cell_origin(x, y):
+    """Top left corner of the tile in column x and row y, where PySudoku.play() puts it."""
+    return x * 57 + (38, 99, 159)[x // 3], y * 57 + (35, 100, 165)[y // 3]
+
+
+class Renderer:
+    """
+    Draws sudokus in dictionary form, redrawing only the cells that changed.
+    Args:
+        surface(pygame.Surface): where to draw, 700 x 700, e.g. the display surface
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.background = pygame.image.load(BACKGROUND).convert()
+        self.font = pygame.font.SysFont(*FONT)
+        self.boxes = [row + col for row in ROWS for col in COLS]
+        self.rects = [pygame.Rect(cell_origin(x, y), TILE_SIZE) for y in range(9) for x in range(9)]
+        self.glyphs = {}
+        # {(cell, digit or None): the cell drawn over its patch of background}
+        self.cells = {}
+        # the digit shown in every cell, None until the first draw()
+        self.shown = None
+
+    def glyph(self, digit):
+        if digit not in self.glyphs:
+            self.glyphs[digit] = self.font.render(digit, 1, TEXT_COLOR)
+        return self.glyphs[digit]
+
+    def cell(self, cell, digit):
+        """The image of a cell showing a digit, or empty for None."""
+        key = (cell, digit)
+        if key not in self.cells:
+            rect = self.rects[cell]
+            image = self.background.subsurface(rect).copy()
+            AAfilledRoundedRect(image, ((0, 0), TILE_SIZE), EMPTY_COLOR if digit is None else SOLVED_COLOR)
+            if digit is not None:
+                image.blit(self.glyph(digit), GLYPH_OFFSET)
+            self.cells[key] = image
+        return self.cells[key]
+
+    def draw(self, values):
+        """
+        Bring the surface up to date with a sudoku.
+        Args:
+            values(dict): a sudoku in dictionary form; boxes that aren't solved are drawn empty
+        Returns:
+            the list of rectangles that changed, the whole surface on the first call
+        """
+
+        first = self.shown is None
+        if first:
+            self.surface.blit(self.background, (0, 0))
+            # matches no digit, so that every cell is drawn
+            self.shown = [False] * len(self.boxes)
+        dirty = []
+        for cell, box in enumerate(self.boxes):
+            digit = values.get(box, '')
+            if len(digit) != 1 or digit == '.':
+                digit = None
+            if digit != self.shown[cell]:
+                self.shown[cell] = digit
+                self.surface.blit(self.cell(cell, digit), self.rects[cell])
+                dirty.append(self.rects[cell])
+        return [self.surface.get_rect()] if first else dirty
+
+
+def play(values_list, fps=5, wait=True):
+    """
+    Replay frames in a window.
+    Args:
+        values_list(iterable): sudokus in dictionary form, one per frame
+        fps(float): frames per second
+        wait(bool): leave the last frame showing until the window is closed
+    """
+
+    pygame.init()
+    try:
+        screen = pygame.display.set_mode(SIZE)
+        renderer = Renderer(screen)
+        clock = pygame.time.Clock()
+        for values in values_list:
+            pygame.event.pump()
+            pygame.display.update(renderer.draw(values))
+            clock.tick(fps)
+        while wait:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            clock.tick(30)
+    finally:
+        pygame.quit()
+
+
+@contextlib.contextmanager
+def headless_display():
+    """
+    Open a display surface on SDL's dummy video driver, which needs no screen.
+    Returns:
+        a context manager giving the 700 x 700 display surface
+    """
+
+    previous = os.environ.get('SDL_VIDEODRIVER')
+    # the driver is chosen when the display starts
+    pygame.display.quit()
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    try:
+        pygame.display.init()
+        pygame.font.init()
+        yield pygame.display.set_mode(SIZE)
+    finally:
+        pygame.display.quit()
+        if previous is None:
+            del os.environ['SDL_VIDEODRIVER']
+        else:
+            os.environ['SDL_VIDEODRIVER'] = previous
+
+
+def export(values_list, path, fps=5):
+    """
+    Render frames without a display.
+    Args:
+        values_list(iterable): sudokus in dictionary form, one per frame
+        path(string): a file name ending in '.gif' for an animation, otherwise a directory,
+            created if needed, for one PNG per frame named frame00001.png and so on
+        fps(float): frames per second of the animation. A PNG sequence has one file per
+            frame, to be played at any rate.
+    Returns:
+        the number of frames written
+    """
+
+    with headless_display() as screen:
+        renderer = Renderer(screen)
+        if path.lower().endswith('.gif'):
+            return _export_gif(renderer, values_list, path, fps)
+        os.makedirs(path, exist_ok=True)
+        count = 0
+        previous = None
+        for count, values in enumerate(values_list, 1):
+            name = os.path.join(path, 'frame{:05d}.png'.format(count))
+            if renderer.draw(values) or previous is None:
+                _save_png(screen, name)
+            else:
+                # nothing changed: copying the last file is much cheaper than encoding it again
+                shutil.copyfile(previous, name)
+            previous = name
+        return count
+
+
+def _save_png(surface, name):
+    try:
+        from PIL import Image
+    except ImportError:
+        pygame.image.save(surface, name)
+        return
+    # about three times faster than pygame's own encoder, which compresses harder
+    Image.frombytes('RGB', SIZE, pygame.image.tostring(surface, 'RGB')).save(name, compress_level=1)
+
+
+def _export_gif(renderer, values_list, path, fps):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError('exporting an animation needs Pillow (pip install pillow); '
+                          'export to a directory of PNG files instead')
+    images = []
+    for values in values_list:
+        if renderer.draw(values) or not images:
+            images.append(Image.frombytes('RGB', SIZE, pygame.image.tostring(renderer.surface, 'RGB')))
+        else:
+            images.append(images[-1])
+    if images:
+        images[0].save(path, save_all=True, append_images=images[1:], duration=round(1000 / fps), loop=0)
+    return len(images)
+
+
+def visualize_assignments(assignments, path=None, fps=5):
+    """
+    Like visualize.visualize_assignments, with the faster filter and renderer.
+    Args:
+        assignments(iterable): sudokus in dictionary form, e.g. AssignmentRecorder.frames()
+        path(string): export to this file or directory instead of showing a window, see export()
+        fps(float): frames per second
+    """
+
+    frames = recording.changed_frames(assignments)
+    if path is None:
+        play(frames, fps)
+    else:
+        export(frames, path, fps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a 9 x 9 sudoku and render the replay without a display.')
+    parser.add_argument('grid', help='the puzzle, 81 characters')
+    parser.add_argument('output', help="a .gif file, or a directory for PNG frames")
+    rules = parser.add_mutually_exclusive_group()
+    rules.add_argument('--diagonal', dest='diagonal', action='store_true', default=None,
+                       help='diagonal rules (the default)')
+    rules.add_argument('--standard', dest='diagonal', action='store_false', help='classic rules')
+    parser.add_argument('--fps', type=float, default=5, help='frames per second')
+    args = parser.parse_args(argv)
+
+    geometry = solution.get_variant(None, args.diagonal)
+    recorder = recording.AssignmentRecorder(geometry, maxlen=None)
+    if solution.solve(args.grid, diagonal=args.diagonal, recorder=recorder) is False:
+        sys.stderr.write('no solution\n')
+        return 1
+    frames = list(recording.changed_frames(recorder.frames()))
+    sys.stderr.write('{} frames written to {}\n'.format(export(frames, args.output, args.fps), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import recording
+import solution
+
+try:
+    import renderer
+except ImportError:
+    renderer = None
+
+
+@unittest.skipIf(renderer is None, 'pygame is not installed')
+class TestRenderer(unittest.TestCase):
+    hard_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+
+    def frames(self):
+        recorder = recording.AssignmentRecorder(solution.geometry)
+        solution.solve(self.hard_grid, recorder=recorder)
+        return list(recording.changed_frames(recorder.frames()))
+
+    def test_dirty_rects(self):
+        frames = self.frames()
+        with renderer.headless_display() as screen:
+            painter = renderer.Renderer(screen)
+            self.assertEqual(painter.draw(frames[0]), [screen.get_rect()])
+            self.assertEqual(painter.draw(frames[0]), [])
+            shown = [{box: value for box, value in frame.items() if len(value) == 1} for frame in frames[:2]]
+            changed = [cell for cell, box in enumerate(painter.boxes) if shown[1].get(box) != shown[0].get(box)]
+            self.assertEqual(painter.draw(frames[1]), [painter.rects[cell] for cell in changed])
+
+    def test_same_picture(self):
+        # drawing only the changes ends with the same pixels as drawing the last frame at once
+        frames = self.frames()
+        with renderer.headless_display() as screen:
+            painter = renderer.Renderer(screen)
+            for values in frames:
+                painter.draw(values)
+            incremental = renderer.pygame.image.tostring(screen, 'RGB')
+            renderer.Renderer(screen).draw(frames[-1])
+            self.assertEqual(renderer.pygame.image.tostring(screen, 'RGB'), incremental)
+
+    def test_export_png(self):
+        frames = self.frames()[:10]
+        path = os.path.join(tempfile.mkdtemp(), 'frames')
+        driver = os.environ.get('SDL_VIDEODRIVER')
+        self.assertEqual(renderer.export(frames + frames[-1:], path), 11)
+        self.assertEqual(sorted(os.listdir(path)), ['frame{:05d}.png'.format(n) for n in range(1, 12)])
+        self.assertEqual(os.environ.get('SDL_VIDEODRIVER'), driver)
+
+
+if __name__ == '__main__':
+    unittest.main()
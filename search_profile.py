@@ -0,0 +1,69 @@
+"""
+Compare the cost of the search modes of solution.solve().
+
+Usage: python search_profile.py [grid ...]
+
+For every grid and search mode, prints the wall time, the peak memory traced by
+tracemalloc during the solve, and the number of memory blocks allocated. CPython has
+no allocation counter, so blocks are counted by sampling sys.getallocatedblocks() on
+every function call and return and adding up the increases; this is a lower bound.
+"""
+import sys
+import time
+import tracemalloc
+
+import solution
+
+default_grids = ['2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3',
+                 '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................']
+
+
+def profile(grid, search_mode):
+    """
+    Measure one solve.
+    Args:
+        grid(string): a sudoku grid
+        search_mode(string): one of solution.search_modes
+    Returns:
+        (seconds, peak bytes, allocated blocks) for the solve
+    """
+
+    begin = time.perf_counter()
+    solution.solve(grid, search_mode)
+    elapsed = time.perf_counter() - begin
+
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    solution.solve(grid, search_mode)
+    peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+    tracemalloc.stop()
+
+    counter = {'last': sys.getallocatedblocks(), 'allocated': 0}
+
+    def sample(frame, event, arg):
+        blocks = sys.getallocatedblocks()
+        if blocks > counter['last']:
+            counter['allocated'] += blocks - counter['last']
+        counter['last'] = blocks
+
+    sys.setprofile(sample)
+    try:
+        solution.solve(grid, search_mode)
+    finally:
+        sys.setprofile(None)
+
+    return elapsed, peak_bytes, counter['allocated']
+
+
+def main(grids):
+    print('{:<6} {:>10} {:>12} {:>10}'.format('mode', 'ms', 'peak KiB', 'blocks'))
+    for grid in grids:
+        print(grid)
+        for search_mode in solution.search_modes:
+            elapsed, peak_bytes, allocated = profile(grid, search_mode)
+            print('{:<6} {:>10.2f} {:>12.1f} {:>10}'.format(search_mode, elapsed * 1000, peak_bytes / 1024.0,
+                                                            allocated))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or default_grids)
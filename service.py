@@ -0,0 +1,348 @@
+"""
+Asyncio JSON-lines solve service.
+
+Usage: python service.py [--host HOST] [--port PORT | --unix PATH] [-w WORKERS]
+                         [--queue-size N] [--timeout SECONDS]
+
+Clients send one JSON object per line and get one JSON object per line back, tagged
+with the "id" they sent. A connection may pipeline any number of requests: they are
+read as fast as the queue takes them and answered as they finish, which need not be in
+the order they were sent.
+
+Requests:
+    {"id": 1, "grid": "4.....8.5.3...", "diagonal": false}
+        further optional fields: "variant" and "size" (see variants.variant()),
+        "regions" for jigsaw, "engine", "strategies", "max_nodes" and "timeout" in
+        seconds, which can only shorten the service's own timeout
+    {"id": 2, "op": "health"}
+    {"id": 3, "op": "metrics"}
+Replies to solve requests:
+    {"id": 1, "status": "solved", "solution": "4173698...", "elapsed_ms": 3.2}
+    status is one of 'solved', 'unsolvable', 'timeout', 'max_nodes' or 'error'; errors
+    carry a "message"
+
+Solves run on a process pool, one per worker at a time. Requests wait in a queue of
+--queue-size; when it is full, the service stops reading from the connections that
+send more, so TCP flow control pushes back on the clients. The timeout of a request
+counts from when it was read, so time spent queued is included, and is enforced in the
+worker by the deadline of solution.solve().
+"""
+import argparse
+import asyncio
+import bisect
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+import deduction
+import solution
+import variants
+
+DEFAULT_TIMEOUT = 10.0
+# extra seconds the service waits for a worker past a request's deadline before giving up on it
+GRACE = 1.0
+# upper bounds of the latency histogram buckets, in milliseconds; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+Job = collections.namedtuple('Job', 'grid options timeout received future')
+
+
+class RequestError(Exception):
+    """A malformed request, answered with status 'error'."""
+
+
+def solve_request(grid, options, deadline):
+    """
+    Solve one request in a worker process.
+    Args:
+        grid(string): the puzzle
+        options(dict): keyword arguments for solution.solve(), with the variant as a
+            (name, size, regions) key
+        deadline(float): seconds left for the request
+    Returns:
+        (status, solution string or None)
+    """
+
+    options = dict(options)
+    rules = variants.variant(*options.pop('variant'))
+    outcome = solution.solve(grid, variant=rules, deadline=deadline, **options)
+    if outcome.status == 'exhausted':
+        return ('timeout' if outcome.reason == 'deadline' else 'max_nodes'), None
+    if outcome.status == 'unsolvable':
+        return 'unsolvable', None
+    return 'solved', solution.grid_string(outcome.values, rules)
+
+
+def parse_request(request, timeout):
+    """
+    Check a solve request and turn it into arguments for solve_request().
+    Returns:
+        (grid, options, timeout)
+    Raises:
+        RequestError: if the request is malformed
+    """
+
+    grid = request.get('grid')
+    if not isinstance(grid, str):
+        raise RequestError('missing grid')
+    name = request.get('variant')
+    if name is None:
+        diagonal = request.get('diagonal')
+        name = solution.DIAGONAL if diagonal is None else diagonal
+        name = 'diagonal' if name else 'classic'
+    size = request.get('size', 9)
+    regions = request.get('regions')
+    try:
+        rules = variants.variant(name, size, regions)
+    except (TypeError, ValueError) as e:
+        raise RequestError(str(e))
+    if len(grid) != len(rules.boxes):
+        raise RequestError('expected {} boxes, got {}'.format(len(rules.boxes), len(grid)))
+    allowed = set(rules.digits + '.0')
+    if any(char not in allowed for char in grid):
+        raise RequestError('unexpected characters in grid')
+    options = {'variant': (name, size, regions)}
+    for key in ('engine', 'strategies', 'max_nodes'):
+        if request.get(key) is not None:
+            options[key] = request[key]
+    if options.get('engine', 'bitboard') not in solution.engines:
+        raise RequestError('unknown engine {!r}'.format(options['engine']))
+    try:
+        deduction.resolve(options.get('strategies'))
+    except (TypeError, ValueError) as e:
+        raise RequestError(str(e))
+    max_nodes = options.get('max_nodes', 0)
+    # bool is a subclass of int, but true is not a number of nodes
+    if isinstance(max_nodes, bool) or not isinstance(max_nodes, int) or max_nodes < 0:
+        raise RequestError('max_nodes must be a non-negative integer')
+    if request.get('timeout') is not None:
+        limit = request['timeout']
+        # written so that NaN fails too
+        if isinstance(limit, bool) or not isinstance(limit, (int, float)) or not limit > 0:
+            raise RequestError('timeout must be a positive number of seconds')
+        timeout = min(timeout, limit)
+    return grid, options, timeout
+
+
+class Service:
+    """
+    The solve service: a process pool fed from a bounded queue.
+    Args:
+        workers(int): worker processes, and solves in progress at once. Default: one per CPU.
+        queue_size(int): requests waiting for a worker before the connections are not
+            read any further. Default: 4 per worker.
+        timeout(float): seconds allowed per request, queueing included
+    """
+
+    def __init__(self, workers=None, queue_size=None, timeout=DEFAULT_TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or 4 * self.workers
+        self.timeout = timeout
+        self.executor = None
+        self.queue = None
+        self.dispatchers = []
+        self.servers = []
+        self.handlers = set()
+        self.started = time.time()
+        self.connections = 0
+        self.in_flight = 0
+        self.statuses = collections.Counter()
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum = 0.0
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """
+        Start the pool and listen on a TCP port, or on a Unix socket if `path` is given.
+        Returns:
+            the asyncio server; port 0 picks a free port, see server.sockets
+        """
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            self.queue = asyncio.Queue(self.queue_size)
+            self.dispatchers = [asyncio.ensure_future(self._dispatch()) for worker in range(self.workers)]
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        # the servers don't stop the connections already open
+        for handler in self.handlers:
+            handler.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def handle(self, reader, writer):
+        """Serve one connection: read requests as the queue allows and write replies as they finish."""
+        self.connections += 1
+        self.handlers.add(asyncio.current_task())
+        replies = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                received = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('expected a JSON object')
+                except ValueError as e:
+                    self._write(writer, {'id': None, 'status': 'error', 'message': 'bad request: {}'.format(e)})
+                    continue
+                op = request.get('op', 'solve')
+                if op == 'health':
+                    self._write(writer, dict(self.health(), id=request.get('id')))
+                elif op == 'metrics':
+                    self._write(writer, dict(self.metrics(), id=request.get('id')))
+                elif op == 'solve':
+                    future = asyncio.get_running_loop().create_future()
+                    try:
+                        grid, options, timeout = parse_request(request, self.timeout)
+                    except RequestError as e:
+                        future.set_result({'status': 'error', 'message': str(e)})
+                    else:
+                        # waits here while the queue is full, which stops reading this connection
+                        await self.queue.put(Job(grid, options, timeout, received, future))
+                    reply = asyncio.ensure_future(self._reply(writer, request.get('id'), received, future))
+                    replies.add(reply)
+                    reply.add_done_callback(replies.discard)
+                else:
+                    self._write(writer, {'id': request.get('id'), 'status': 'error',
+                                         'message': 'unknown op {!r}'.format(op)})
+                await writer.drain()
+            if replies:
+                await asyncio.gather(*replies)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # a cancellation comes from close(), and ends the connection like the client leaving
+            pass
+        finally:
+            self.connections -= 1
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _reply(self, writer, request_id, received, future):
+        reply = await future
+        elapsed = time.perf_counter() - received
+        self._record(reply['status'], elapsed)
+        reply['id'] = request_id
+        reply['elapsed_ms'] = round(elapsed * 1000, 3)
+        if not writer.is_closing():
+            self._write(writer, reply)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def _write(writer, message):
+        writer.write(json.dumps(message).encode() + b'\n')
+
+    async def _dispatch(self):
+        """Take jobs off the queue and solve them on the pool, one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                reply = await self._solve(loop, job)
+            except Exception as e:
+                reply = {'status': 'error', 'message': repr(e)}
+            if not job.future.done():
+                job.future.set_result(reply)
+
+    async def _solve(self, loop, job):
+        remaining = job.timeout - (time.perf_counter() - job.received)
+        if remaining <= 0:
+            return {'status': 'timeout'}
+        executor = self.executor
+        self.in_flight += 1
+        try:
+            call = loop.run_in_executor(executor, solve_request, job.grid, job.options, remaining)
+            status, answer = await asyncio.wait_for(call, remaining + GRACE)
+        except asyncio.TimeoutError:
+            return {'status': 'timeout'}
+        except concurrent.futures.BrokenExecutor as e:
+            # a worker died; start a new pool for the requests that follow, once
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            return {'status': 'error', 'message': repr(e)}
+        finally:
+            self.in_flight -= 1
+        reply = {'status': status}
+        if answer is not None:
+            reply['solution'] = answer
+        return reply
+
+    def _record(self, status, elapsed):
+        self.statuses[status] += 1
+        self.latency_sum += elapsed
+        self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+    def health(self):
+        """Liveness and load, cheap enough to poll."""
+        return {'status': 'ok',
+                'workers': self.workers,
+                'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'connections': self.connections,
+                'uptime': time.time() - self.started}
+
+    def metrics(self):
+        """Counters and the latency histogram of the solve requests answered so far."""
+        count = sum(self.statuses.values())
+        buckets = [[bound, n] for bound, n in zip(LATENCY_BUCKETS_MS + ('inf',), self.latency_counts)]
+        return dict(self.health(),
+                    requests=count,
+                    statuses=dict(self.statuses),
+                    latency_ms={'mean': self.latency_sum / count * 1000 if count else 0.0,
+                                'buckets': buckets})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve sudoku solves as JSON lines.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--queue-size', type=int, default=None, help='requests waiting for a worker at most')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds allowed per request')
+    args = parser.parse_args(argv)
+
+    async def serve():
+        service = Service(args.workers, args.queue_size, args.timeout)
+        server = await service.start(args.host, args.port, args.unix)
+        sys.stderr.write('listening on {}\n'.format(args.unix or server.sockets[0].getsockname()))
+        try:
+            await server.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark
+import loadgen
+import service
+import solution
+
+
+class TestService(unittest.TestCase):
+    easy_grid = '..8.4.15.2...63......1.5..87.3.219.414..87..58.95....6.8....34......2.67.6.4.8...'
+    unsolvable_grid = '8..........36......7..9.2...5...7.......457.....1...3...1....68..83...1..9....4..'
+
+    def serve(self, client, **options):
+        """Run `client(connect, service)` against a service with 2 workers on a free port."""
+
+        async def main():
+            server = service.Service(2, **options)
+            port = (await server.start('127.0.0.1', 0)).sockets[0].getsockname()[1]
+            try:
+                return await client(lambda: asyncio.open_connection('127.0.0.1', port), server)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    @staticmethod
+    async def exchange(connect, requests):
+        """Pipeline all the requests on one connection and return the replies by id."""
+        reader, writer = await connect()
+        for request in requests:
+            writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b'\n')
+        await writer.drain()
+        replies = {}
+        for request in requests:
+            reply = json.loads(await reader.readline())
+            replies[reply['id']] = reply
+        writer.close()
+        return replies
+
+    def test_requests(self):
+        requests = [{'id': 1, 'grid': self.easy_grid, 'diagonal': False},
+                    {'id': 2, 'grid': self.unsolvable_grid, 'diagonal': False, 'engine': 'dlx'},
+                    {'id': 3, 'grid': '.' * 16, 'size': 4, 'strategies': 'all'},
+                    {'id': 4, 'grid': 'x' * 81},
+                    {'id': 5, 'grid': self.easy_grid, 'strategies': ['guessing']},
+                    {'id': 6, 'op': 'reboot'},
+                    'not json',
+                    {'id': 7, 'op': 'health'}]
+        replies = self.serve(lambda connect, server: self.exchange(connect, requests))
+        self.assertEqual(replies[1]['status'], 'solved')
+        self.assertEqual(replies[1]['solution'],
+                         solution.grid_string(solution.solve(self.easy_grid, diagonal=False)))
+        self.assertEqual(replies[2]['status'], 'unsolvable')
+        self.assertNotIn('solution', replies[2])
+        self.assertEqual(replies[3]['status'], 'solved')
+        self.assertEqual(len(replies[3]['solution']), 16)
+        for request_id in (4, 5, 6, None):
+            self.assertEqual(replies[request_id]['status'], 'error')
+            self.assertIn('message', replies[request_id])
+        self.assertEqual(replies[7]['status'], 'ok')
+        self.assertEqual(replies[7]['workers'], 2)
+
+    def test_limits(self):
+        requests = [{'id': 1, 'grid': '.' * 81, 'diagonal': False, 'timeout': 1e-9},
+                    {'id': 2, 'grid': '.' * 81, 'max_nodes': 5}]
+        replies = self.serve(lambda connect, server: self.exchange(connect, requests))
+        self.assertEqual(replies[1]['status'], 'timeout')
+        self.assertEqual(replies[2]['status'], 'max_nodes')
+
+    def test_bad_limits(self):
+        for limits in ({'timeout': 0}, {'timeout': -1}, {'timeout': float('nan')}, {'timeout': True},
+                       {'timeout': '1'}, {'max_nodes': -1}, {'max_nodes': True}, {'max_nodes': 1.5}):
+            request = dict(limits, grid=self.easy_grid)
+            self.assertRaises(service.RequestError, service.parse_request, request, 10.0)
+        self.assertEqual(service.parse_request({'grid': self.easy_grid, 'timeout': 0.5, 'max_nodes': 0}, 10.0)[2],
+                         0.5)
+
+    def test_metrics(self):
+        async def client(connect, server):
+            await self.exchange(connect, [{'id': n, 'grid': self.easy_grid, 'diagonal': False} for n in range(5)])
+            return (await self.exchange(connect, [{'id': 'm', 'op': 'metrics'}]))['m']
+
+        metrics = self.serve(client)
+        self.assertEqual(metrics['requests'], 5)
+        self.assertEqual(metrics['statuses'], {'solved': 5})
+        self.assertEqual(sum(n for bound, n in metrics['latency_ms']['buckets']), 5)
+        self.assertGreater(metrics['latency_ms']['mean'], 0)
+
+    def test_load(self):
+        # a queue much shorter than the requests in flight, so the backpressure is exercised
+        grids = benchmark.bundled_corpora()['easy'].grids[:20]
+        result = self.serve(lambda connect, server: loadgen.run(connect, grids, 100, 3, 10, {'diagonal': False}),
+                            queue_size=2)
+        self.assertEqual(result.statuses, {'solved': 100})
+        self.assertEqual(len(result.latencies), 100)
+        self.assertIn('100 requests', loadgen.report(result))
+
+    def test_unmatched_replies(self):
+        class Writer:
+            def write(self, data):
+                pass
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+
+        async def main():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'{"id": null, "status": "error", "message": "bad request"}\n'
+                             b'{"id": 0, "status": "solved"}\n')
+
+            async def connect():
+                return reader, Writer()
+            statuses, latencies = collections.Counter(), []
+            await loadgen._connection(connect, [(0, {}), (1, {})], 2, statuses, latencies)
+            return statuses, latencies
+        statuses, latencies = asyncio.run(main())
+        self.assertEqual(statuses, {'solved': 1, 'error': 1})
+        self.assertEqual(len(latencies), 1)
+
+    @unittest.skipIf(not hasattr(asyncio, 'start_unix_server'), 'no Unix sockets')
+    def test_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), 'sudoku.sock')
+
+        async def main():
+            server = service.Service(1)
+            await server.start(path=path)
+            try:
+                return await self.exchange(lambda: asyncio.open_unix_connection(path),
+                                           [{'id': 1, 'grid': self.easy_grid, 'diagonal': False}])
+            finally:
+                await server.close()
+        self.assertEqual(asyncio.run(main())[1]['status'], 'solved')
+
+
+if __name__ == '__main__':
+    unittest.main()
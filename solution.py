@@ -1,81 +1,131 @@
-assignments = []
+import collections
+import functools
+import time
+
+import bitboard
+import deduction
+import dlx
+import variants
+from instrumentation import SolveStats
 
 # Setting to define if Sudoku to solve is diagonal or not. Set to False if not.
+# Only the default: every function also takes a variant.
 DIAGONAL = True
 
+cross = variants.cross
 
-def cross(a, b):
-    """Cross product of elements in A and elements in B."""
-    return [s + t for s in a for t in b]
+# The standard 9 x 9 variants. Everything else comes from variants.variant().
+classic_geometry = variants.variant('classic')
+diagonal_geometry = variants.variant('diagonal')
+geometry = diagonal_geometry if DIAGONAL else classic_geometry
 
+# Box names and units of the default variant
 rows = 'ABCDEFGHI'
 cols = '123456789'
-boxes = cross(rows, cols)
-
-row_units = [cross(r, cols) for r in rows]
-column_units = [cross(rows, c) for c in cols]
-square_units = [cross(rs, cs) for rs in ('ABC', 'DEF', 'GHI') for cs in ('123', '456', '789')]
-diagonal_units = [[r + c for r, c in zip(rows, cols)], [r + c for r, c in zip(rows, cols[::-1])]]
-
-
-unitlist = row_units + column_units + square_units
-
-if DIAGONAL:
-    unitlist = unitlist + diagonal_units
+boxes = geometry.boxes
+unitlist = geometry.unit_boxes
+units = geometry.box_units
+peers = geometry.box_peers
+# Units shared by each pair of peers, so naked_twins doesn't rescan the units per pair
+shared_units = geometry.box_shared_units
+
+# Search strategies and solving backends selectable in solve()
+search_modes = ('copy', 'trail')
+engines = ('bitboard', 'dlx')
+
+Outcome = collections.namedtuple('Outcome', 'status values reason nodes elapsed')
+Outcome.__doc__ = """
+Result of a solve with a budget.
+    status(string): 'solved', 'unsolvable' or 'exhausted'
+    values(dict): the solution if solved. If the budget ran out, the most-reduced board
+        found: every deduction made before the search started guessing, so each box
+        still holds its digit of any solution. False if unsolvable.
+    reason(string): 'deadline' or 'nodes' if the budget ran out, else None
+    nodes(int): search nodes used
+    elapsed(float): seconds spent
+"""
+
+
+def get_variant(variant=None, diagonal=None):
+    """
+    Resolve the variant arguments taken throughout this module.
+    Args:
+        variant(string or variants.Geometry): a variant name such as 'windoku', or a
+            Geometry from variants.variant() for other sizes and jigsaw regions
+        diagonal(bool): without a variant, choose between the 9 x 9 diagonal and classic
+            variants. Default: DIAGONAL.
+    Returns:
+        a variants.Geometry
+    """
 
-units = dict((s, [u for u in unitlist if s in u]) for s in boxes)
-peers = dict((s, set(sum(units[s], []))-set([s])) for s in boxes)
+    if variant is None:
+        if diagonal is None:
+            diagonal = DIAGONAL
+        return diagonal_geometry if diagonal else classic_geometry
+    if isinstance(variant, str):
+        return variants.variant(variant)
+    return variant
 
 
-def assign_value(values, box, value):
+def assign_value(values, box, value, recorder=None):
     """
     Please use this function to update your values dictionary!
-    Assigns a value to a given box. If it updates the board record it.
+    Assigns a value to a given box. If it updates the board and a recorder is given, record it.
     """
 
-    # Don't waste memory appending actions that don't actually change any values
+    # Don't waste time recording actions that don't actually change any values
     if values[box] == value:
         return values
 
+    if recorder is not None:
+        recorder.record_value(box, values[box], value)
     values[box] = value
-    if len(value) == 1:
-        assignments.append(values.copy())
 
     return values
 
 
-def naked_twins(values):
+def naked_twins(values, recorder=None, variant=None):
     """Eliminate values using the naked twins strategy.
     Args:
         values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        recorder(recording.AssignmentRecorder): optional, records the changes made
+        variant: optional, see get_variant()
 
     Returns:
         the values dictionary with the naked twins eliminated from peers.
     """
+    rules = get_variant(variant)
+    peers = rules.box_peers
     # Find all instances of naked twins
     dual_boxes = [box for box in values.keys() if len(values[box]) == 2]
     for dual_box in dual_boxes:
-        second_dual_boxes = [second_box for second_box in dual_boxes
-                             if dual_box != second_box and values[dual_box] == values[second_box]
-                             and second_box in peers[dual_box]]
-
-        for second_dual_box in second_dual_boxes:
-            boxes_to_clean = [peer_set for peer_set in unitlist
-                              if (dual_box in peer_set and second_dual_box in peer_set)]
-            for group in boxes_to_clean:
+        for second_dual_box in peers[dual_box]:
+            if len(values[dual_box]) != 2 or values[dual_box] != values[second_dual_box]:
+                continue
+
+            for group in rules.box_shared_units[dual_box, second_dual_box]:
                 for box in group:
                     # weed out boxes with empty values or solved boxes
                     if len(values[box]) > 1 and box != dual_box and box != second_dual_box:
                         for digit in values[dual_box]:
-                            assign_value(values, box, values[box].replace(digit, ''))
+                            assign_value(values, box, values[box].replace(digit, ''), recorder)
     return values
 
 
-def grid_values(grid):
+@functools.lru_cache(maxsize=None)
+def _grid_chars(rules):
+    """{character of a grid: value of its box} for a variant."""
+    chars = dict((digit, digit) for digit in rules.digits)
+    chars['.'] = chars['0'] = rules.digits
+    return chars
+
+
+def grid_values(grid, variant=None):
     """
     Convert grid into a dict of {square: char} with '123456789' for empties.
     Args:
-        grid(string) - A grid in string form.
+        grid(string) - A grid in string form, with '.' or '0' for empties.
+        variant - optional, see get_variant(). Sets the size and the digits.
     Returns:
         A grid in dictionary form
             Keys: The boxes, e.g., 'A1'
@@ -83,77 +133,105 @@ def grid_values(grid):
                     then the value will be '123456789'.
     """
 
+    rules = get_variant(variant)
+    if len(grid) == len(rules.boxes):
+        # one character per box, the common case: look them all up at once
+        try:
+            return dict(zip(rules.boxes, map(_grid_chars(rules).__getitem__, grid)))
+        except KeyError:
+            pass
     chars = []
-    digits = '123456789'
+    digits = rules.digits
     for c in grid:
         if c in digits:
             chars.append(c)
-        if c == '.':
+        if c == '.' or c == '0':
             chars.append(digits)
-    assert len(chars) == 81
-    return dict(zip(boxes, chars))
+    assert len(chars) == len(rules.boxes)
+    return dict(zip(rules.boxes, chars))
+
+
+def grid_string(values, variant=None):
+    """
+    Convert a sudoku in dictionary form back into grid form.
+    Args:
+        values(dict): The sudoku in dictionary form
+        variant: optional, see get_variant()
+    Returns:
+        A grid in string form, with '.' for boxes that are not solved.
+    """
+
+    return ''.join(values[s] if len(values[s]) == 1 else '.' for s in get_variant(variant).boxes)
 
 
-def display(values):
+def display(values, variant=None):
     """
     Display the values as a 2-D grid.
     Args:
         values(dict): The sudoku in dictionary form
+        variant: optional, see get_variant()
     """
 
     if values is False:
         return
-    width = 1+max(len(values[s]) for s in boxes)
-    line = '+'.join(['-'*(width*3)]*3)
-    for r in rows:
-        print(''.join(values[r+c].center(width)+('|' if c in '36' else '')
-                      for c in cols))
-        if r in 'CF':
+    rules = get_variant(variant)
+    # boards built by hand have no row names; irregular regions get no box lines
+    rows = rules.rows or classic_geometry.rows
+    cols = rules.cols or classic_geometry.cols
+    side = rules.side or len(rows)
+    width = 1+max(len(values[s]) for s in rules.boxes)
+    line = '+'.join(['-'*(width*side)]*(len(cols) // side))
+    for i, r in enumerate(rows, 1):
+        print(''.join(values[r+c].center(width)+('|' if j % side == 0 and j < len(cols) else '')
+                      for j, c in enumerate(cols, 1)))
+        if i % side == 0 and i < len(rows):
             print(line)
     return
 
 
-def eliminate(values):
+def eliminate(values, recorder=None, variant=None):
     """
     Eliminate values from peers of each box with a single value.
     Args:
-        a sudoku in dictionary form
+        a sudoku in dictionary form, and optionally a recorder for the changes made and a variant
     Returns:
         the values dictionary with eliminated values from peers.
     """
 
+    peers = get_variant(variant).box_peers
     solved_values = [box for box in values.keys() if len(values[box]) == 1]
     for box in solved_values:
         digit = values[box]
         for peer in peers[box]:
-            assign_value(values, peer, values[peer].replace(digit, ''))
+            assign_value(values, peer, values[peer].replace(digit, ''), recorder)
 
     return values
 
 
-def only_choice(values):
+def only_choice(values, recorder=None, variant=None):
     """
     Finalize all values that are the only choice for a unit.
     Args:
-        a sudoku in dictionary form
+        a sudoku in dictionary form, and optionally a recorder for the changes made and a variant
     Returns:
         resulting Sudoku in dictionary form after filling in only choices.
     """
 
-    for unit in unitlist:
-        for digit in '123456789':
+    rules = get_variant(variant)
+    for unit in rules.unit_boxes:
+        for digit in rules.digits:
             dplaces = [box for box in unit if digit in values[box]]
             if len(dplaces) == 1:
-                values = assign_value(values, dplaces[0], digit)
+                values = assign_value(values, dplaces[0], digit, recorder)
 
     return values
 
 
-def reduce_puzzle(values):
+def reduce_puzzle(values, recorder=None, variant=None):
     """
     Executes eliminate, only_choice and naked_twins functions until no further reduction possible.
     Args:
-        a sudoku in dictionary form
+        a sudoku in dictionary form, and optionally a recorder for the changes made and a variant
     Returns:
         resulting Sudoku in dictionary form after reduction.
     """
@@ -162,9 +240,9 @@ def reduce_puzzle(values):
     while not stalled:
         solved_values_before = len(
             [box for box in values.keys() if len(values[box]) == 1])
-        values = eliminate(values)
-        values = only_choice(values)
-        values = naked_twins(values)
+        values = eliminate(values, recorder, variant)
+        values = only_choice(values, recorder, variant)
+        values = naked_twins(values, recorder, variant)
         solved_values_after = len(
             [box for box in values.keys() if len(values[box]) == 1])
         # Stop if no further changes were made
@@ -176,56 +254,200 @@ def reduce_puzzle(values):
     return values
 
 
-def search(values):
+def search(values, recorder=None, variant=None):
     """
      Recursive call of reduce_puzzle and DFS trial and error.
      Args:
-         a sudoku in dictionary form
+         a sudoku in dictionary form, and optionally a recorder for the changes made and a variant
      Returns:
          resulting Sudoku in dictionary form. "False" if no solution could be found
      """
 
-    values = reduce_puzzle(values)
+    values = reduce_puzzle(values, recorder, variant)
     if values is False:
         return False
+    boxes = get_variant(variant).boxes
     if all(len(values[s]) == 1 for s in boxes):
         return values
     n, s = min((len(values[s]), s) for s in boxes if len(values[s]) > 1)
     for value in values[s]:
         new_sudoku = values.copy()
         new_sudoku[s] = value
-        attempt = search(new_sudoku)
+        if recorder is not None:
+            # the previous branch may have left other values behind
+            recorder.sync_values(new_sudoku)
+        attempt = search(new_sudoku, recorder, variant)
         if attempt:
             return attempt
 
 
-def solve(grid):
+def solve(grid, search_mode=None, tie_break='first', value_order='ascending', recorder=None,
+          diagonal=None, stats=None, variant=None, engine='bitboard', strategies=None, deadline=None,
+          max_nodes=None):
     """
     Find the solution to a Sudoku grid.
     Args:
         grid(string): a string representing a sudoku grid.
             Example: '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+        search_mode(string): 'copy' copies the board at every branch, 'trail' searches one
+            board in place and undoes failed branches. Default: 'copy', which is the faster of
+            the two on 9 x 9 boards, or 'trail' when recording or when a tie_break or
+            value_order other than the default is given.
+        tie_break(string or function): how 'trail' picks among equally constrained cells,
+            a key of bitboard.tie_breakers or a function with the same signature.
+        value_order(string or function): the order 'trail' tries candidates in,
+            a key of bitboard.value_orders or a function with the same signature.
+        recorder(recording.AssignmentRecorder): records every change for visualization.
+            Off by default; requires search_mode 'trail'.
+        diagonal(bool): whether the diagonals are units too. Default: DIAGONAL.
+        stats(instrumentation.SolveStats): filled in with per-strategy counters, timings and
+            search statistics; its hooks are called as the solve progresses. Off by default.
+        variant(string or variants.Geometry): the rules and size of the board, see
+            get_variant(). Overrides `diagonal`.
+        engine(string): 'bitboard' propagates and searches candidate masks as set by
+            search_mode; 'dlx' propagates, then solves the rest as an exact-cover problem
+            with Dancing Links, which copes better with puzzles where propagation stalls
+            early. Both give the same answer for puzzles with a single solution.
+        strategies: deduction strategies to try when eliminate, only_choice and
+            naked_twins stall, as names from deduction.strategies or 'all'. They cost time
+            per propagation and save search nodes on hard puzzles. Default: none.
+        deadline(float): seconds the solve may take. Checked every few dozen units and
+            search nodes, so it can be overrun by about that much work.
+        max_nodes(int): search nodes the solve may try
     Returns:
         The dictionary representation of the final sudoku grid.
         False if no solution exists.
+        With a deadline or max_nodes, an Outcome instead.
     """
 
-    values = grid_values(grid)
-    values = search(values)
+    begin = time.perf_counter()
+    budget = None
+    if deadline is not None or max_nodes is not None:
+        budget = bitboard.Budget(deadline, max_nodes)
+    rules = get_variant(variant, diagonal)
+    board = bitboard.from_values(grid_values(grid, rules), rules)
+    if engine not in engines:
+        raise ValueError('unknown engine {!r}, expected one of {}'.format(engine, engines))
+    strategies = deduction.resolve(strategies)
+    if search_mode is None:
+        custom = recorder is not None or tie_break != 'first' or value_order != 'ascending'
+        search_mode = 'trail' if custom else 'copy'
+    if recorder is not None:
+        if search_mode == 'copy' or engine == 'dlx':
+            raise ValueError("recording requires search_mode 'trail' and engine 'bitboard'")
+        recorder.start(board)
+    try:
+        if engine == 'dlx':
+            solved = dlx.solve(board, rules, stats, strategies, budget)
+        elif search_mode == 'copy':
+            solved = bitboard.search(board, rules, None, stats, 0, strategies, budget)
+        else:
+            solved = bitboard.search_in_place(board, rules,
+                                              bitboard.tie_breakers.get(tie_break, tie_break),
+                                              bitboard.value_orders.get(value_order, value_order),
+                                              recorder, stats, strategies, budget)
+    except bitboard.BudgetExhausted as e:
+        elapsed = time.perf_counter() - begin
+        if stats is not None:
+            stats.done(elapsed)
+        # out of budget during the first propagation, the board holds the removals made so far
+        reduced = board if budget.reduced is None else budget.reduced
+        return Outcome('exhausted', bitboard.to_values(reduced, rules), e.args[0], budget.nodes, elapsed)
+    elapsed = time.perf_counter() - begin
+    if stats is not None:
+        stats.done(elapsed)
+    values = solved and bitboard.to_values(solved, rules)
+    if budget is None:
+        return values
+    return Outcome('solved' if values else 'unsolvable', values, None, budget.nodes, elapsed)
 
-    return values
+
+def solve_with_stats(grid, **kwargs):
+    """
+    Solve a grid and collect statistics about the solve.
+    Args:
+        grid(string): a string representing a sudoku grid
+        kwargs: further arguments for solve()
+    Returns:
+        (solution as returned by solve(), instrumentation.SolveStats)
+    """
+
+    stats = SolveStats()
+    return solve(grid, stats=stats, **kwargs), stats
+
+
+def iter_solutions(grid, tie_break='first', value_order='ascending', diagonal=None, stats=None, variant=None,
+                   strategies=None):
+    """
+    Enumerate the solutions of a Sudoku grid lazily.
+    The search resumes from its last branch after each solution, so the work done above
+    that branch is shared rather than repeated.
+    Args:
+        grid(string): a string representing a sudoku grid
+        tie_break, value_order, diagonal, stats, variant, strategies: as for solve()
+    Returns:
+        an iterator of solutions in dictionary form
+    """
+
+    rules = get_variant(variant, diagonal)
+    board = bitboard.from_values(grid_values(grid, rules), rules)
+    for solved in bitboard.iter_in_place(board, rules, bitboard.tie_breakers.get(tie_break, tie_break),
+                                         bitboard.value_orders.get(value_order, value_order), None, stats,
+                                         deduction.resolve(strategies)):
+        yield bitboard.to_values(solved, rules)
+
+
+def count_solutions(grid, limit=2, tie_break='first', value_order='ascending', diagonal=None, stats=None,
+                    variant=None, strategies=None):
+    """
+    Count the solutions of a Sudoku grid, stopping once `limit` of them are found.
+    Args:
+        grid(string): a string representing a sudoku grid
+        limit(int): the most solutions to look for. None counts them all.
+        tie_break, value_order, diagonal, stats, variant, strategies: as for solve()
+    Returns:
+        the number of solutions, at most `limit`
+    """
+
+    rules = get_variant(variant, diagonal)
+    board = bitboard.from_values(grid_values(grid, rules), rules)
+    # count the boards as they come, without converting them to dictionaries
+    count = 0
+    for solved in bitboard.iter_in_place(board, rules, bitboard.tie_breakers.get(tie_break, tie_break),
+                                         bitboard.value_orders.get(value_order, value_order), None, stats,
+                                         deduction.resolve(strategies)):
+        count += 1
+        if count == limit:
+            break
+    return count
+
+
+def classify(grid, **kwargs):
+    """
+    Tell whether a Sudoku grid is well-formed.
+    Args:
+        grid(string): a string representing a sudoku grid
+        kwargs: further arguments for count_solutions()
+    Returns:
+        'unique', 'multiple' or 'none'
+    """
+
+    return ('none', 'unique', 'multiple')[count_solutions(grid, 2, **kwargs)]
 
 
 if __name__ == '__main__':
+    from recording import AssignmentRecorder
+
     # diag_sudoku_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
     # diag_sudoku_grid = '...95.7..7513.2...2.4.18536.......93.2.....1.84.......96253.1.4...2.9367..7.41...'
     # diag_sudoku_grid = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'
     diag_sudoku_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
-    display(solve(diag_sudoku_grid))
+    recorder = AssignmentRecorder(geometry)
+    display(solve(diag_sudoku_grid, recorder=recorder))
 
     try:
-        from visualize import visualize_assignments
-        visualize_assignments(assignments)
+        from renderer import visualize_assignments
+        visualize_assignments(list(recorder.frames()))
 
     except SystemExit:
         pass
@@ -0,0 +1,196 @@
+"""
+Board geometries of sudoku variants.
+
+A Geometry holds everything the solver needs to know about a board: its boxes, its
+units, the peers of every box and the candidate-mask lookup tables for its digits. The
+tables are built once per variant by variant() and cached, so one process can solve
+classic, diagonal, windoku and jigsaw puzzles of any supported size side by side.
+
+Boards are N x N for N = 4, 9, 16 or 25 (any square of a box side works), with the
+digits 1-9 followed by letters, e.g. 1-9 and A-G on a 16 x 16 board.
+"""
+import functools
+
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'
+ROW_NAMES = 'ABCDEFGHIJKLMNOPQRSTUVWXY'
+VARIANTS = ('classic', 'diagonal', 'windoku', 'jigsaw')
+
+# Boards with at most this many digits get complete popcount tables indexed by mask;
+# larger ones compute each entry when it is looked up, since 2 ** 25 entries would not
+# fit in memory
+FULL_TABLE_SIZE = 16
+# The same for the digit strings of masks, which are slower to build and only used to
+# convert boards back to strings
+FULL_DIGITS_TABLE_SIZE = 9
+
+
+def cross(a, b):
+    """Cross product of elements in A and elements in B."""
+    return [s + t for s in a for t in b]
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+class MaskFunction:
+    """Indexed like a table of function(mask), but computes every entry when it is looked up."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __getitem__(self, mask):
+        return self.function(mask)
+
+
+def mask_table(function, size, limit=FULL_TABLE_SIZE):
+    """A lookup table of function(mask) for every mask of `size` digits, if there are at most `limit`."""
+    if size <= limit:
+        return [function(mask) for mask in range(1 << size)]
+    return MaskFunction(function)
+
+
+class Geometry:
+    """
+    Integer-indexed lookup tables for a set of boxes and units.
+    Args:
+        boxes(list): box names, e.g. ['A1', 'A2', ...]. Cell i of a board is boxes[i].
+        unitlist(list): units as lists of box names.
+        digits(string): the symbols of the digits. Default: as many of SYMBOLS as a unit has boxes.
+        name(string): the variant, for display
+    """
+
+    def __init__(self, boxes, unitlist, digits=None, name=None):
+        self.boxes = list(boxes)
+        self.index = dict((box, cell) for cell, box in enumerate(self.boxes))
+        self.name = name
+        cells = range(len(self.boxes))
+
+        self.unit_boxes = [list(unit) for unit in unitlist]
+        self.unitlist = [tuple(self.index[box] for box in unit) for unit in unitlist]
+        # cell_units[cell] holds the indices into unitlist of every unit containing the cell
+        cell_units = [[] for cell in cells]
+        for u, unit in enumerate(self.unitlist):
+            for cell in unit:
+                cell_units[cell].append(u)
+        self.cell_units = [tuple(units) for units in cell_units]
+        self.units = [tuple(self.unitlist[u] for u in self.cell_units[cell]) for cell in cells]
+        self.peers = [tuple(sorted(set(peer for unit in self.units[cell] for peer in unit) - set([cell])))
+                      for cell in cells]
+        # shared_units[a][b] holds the units containing both a and b; empty unless they are peers
+        self.shared_units = [[()] * len(self.boxes) for cell in cells]
+        for cell in cells:
+            for peer in self.peers[cell]:
+                self.shared_units[cell][peer] = tuple(unit for unit in self.units[cell] if peer in unit)
+
+        # the same tables keyed by box name, for the dictionary strategies in solution.py
+        self.box_units = dict((box, [self.unit_boxes[u] for u in self.cell_units[cell]])
+                              for cell, box in enumerate(self.boxes))
+        self.box_peers = dict((box, set(self.boxes[peer] for peer in self.peers[cell]))
+                              for cell, box in enumerate(self.boxes))
+        self.box_shared_units = dict(((box, self.boxes[peer]), [self.unit_boxes[u] for u in self.cell_units[cell]
+                                                                  if u in self.cell_units[peer]])
+                                     for cell, box in enumerate(self.boxes) for peer in self.peers[cell])
+
+        # digits and candidate-mask tables
+        self.size = max(len(unit) for unit in self.unitlist)
+        self.digits = digits or SYMBOLS[:self.size]
+        self.all_digits = (1 << len(self.digits)) - 1
+        self.digit_masks = dict((d, 1 << i) for i, d in enumerate(self.digits))
+        self.popcount = mask_table(getattr(int, 'bit_count', popcount), len(self.digits))
+        self.mask_digits = mask_table(self.candidates, len(self.digits), FULL_DIGITS_TABLE_SIZE)
+        # set by variant(): row and column names, box side for display (None for irregular
+        # regions) and the cache key, so pickling sends the key instead of the tables
+        self.rows = None
+        self.cols = None
+        self.side = None
+        self.key = None
+
+    def candidates(self, mask):
+        """The digits of a candidate mask as a string."""
+        return ''.join(d for i, d in enumerate(self.digits) if mask >> i & 1)
+
+    def __reduce__(self):
+        if self.key is None:
+            return object.__reduce__(self)
+        return variant, self.key
+
+    def __repr__(self):
+        return '<Geometry {} {}x{}>'.format(self.name, self.size, self.size)
+
+
+def _lines(size):
+    """Row names, column names and the box side of a size x size board."""
+    side = int(round(size ** 0.5))
+    if side * side != size or not 1 < size <= len(SYMBOLS):
+        raise ValueError('unsupported board size {}, expected one of 4, 9, 16, 25'.format(size))
+    return ROW_NAMES[:size], [str(c) for c in range(1, size + 1)], side
+
+
+def _boxes(rows, cols, side):
+    return [[r + c for r in rows[i:i + side] for c in cols[j:j + side]]
+            for i in range(0, len(rows), side) for j in range(0, len(cols), side)]
+
+
+def _diagonals(rows, cols):
+    return [[r + c for r, c in zip(rows, cols)], [r + c for r, c in zip(rows, cols[::-1])]]
+
+
+def _windows(rows, cols, side):
+    """The extra windoku regions: boxes one row and column apart, starting at the second line."""
+    starts = range(1, len(rows) - side, side + 1)
+    return [[r + c for r in rows[i:i + side] for c in cols[j:j + side]] for i in starts for j in starts]
+
+
+def _regions(rows, cols, regions):
+    """Jigsaw regions from a string with one region label per box, in box order."""
+    boxes = cross(rows, cols)
+    if len(regions) != len(boxes):
+        raise ValueError('expected {} region labels, got {}'.format(len(boxes), len(regions)))
+    labels = {}
+    for box, label in zip(boxes, regions):
+        labels.setdefault(label, []).append(box)
+    if len(labels) != len(rows) or any(len(region) != len(rows) for region in labels.values()):
+        raise ValueError('expected {0} regions of {0} boxes each'.format(len(rows)))
+    return [labels[label] for label in sorted(labels)]
+
+
+def variant(name='classic', size=9, regions=None):
+    """
+    The Geometry of a variant, built once and cached.
+    Args:
+        name(string): one of VARIANTS. 'diagonal' adds the two diagonals as units, 'windoku'
+            adds the windows between the boxes and 'jigsaw' replaces the boxes by `regions`.
+        size(int): the number of digits, and of rows and columns
+        regions(string): for 'jigsaw', one region label per box in row-major order
+    Returns:
+        a Geometry
+    """
+
+    return _build(name, size, regions)
+
+
+@functools.lru_cache(maxsize=None)
+def _build(name, size, regions):
+    rows, cols, side = _lines(size)
+    row_units = [cross(r, cols) for r in rows]
+    column_units = [cross(rows, [c]) for c in cols]
+    if name == 'jigsaw':
+        if regions is None:
+            raise ValueError('the jigsaw variant needs regions')
+        unitlist = row_units + column_units + _regions(rows, cols, regions)
+    elif name in VARIANTS:
+        unitlist = row_units + column_units + _boxes(rows, cols, side)
+        if name == 'diagonal':
+            unitlist += _diagonals(rows, cols)
+        elif name == 'windoku':
+            unitlist += _windows(rows, cols, side)
+    else:
+        raise ValueError('unknown variant {!r}, expected one of {}'.format(name, VARIANTS))
+    geometry = Geometry(cross(rows, cols), unitlist, SYMBOLS[:size], name)
+    geometry.rows = rows
+    geometry.cols = cols
+    # box side for display; jigsaw regions have no regular outline
+    geometry.side = None if name == 'jigsaw' else side
+    geometry.key = (name, size, regions)
+    return geometry
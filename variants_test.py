@@ -0,0 +1,67 @@
+import pickle
+import unittest
+
+import solution
+import variants
+
+
+class TestVariants(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    jigsaw_regions = 'AAAB' 'CABB' 'CCDB' 'CDDD'
+
+    def assertSolved(self, values, geometry, grid=None):
+        for unit in geometry.unit_boxes:
+            self.assertEqual(sorted(values[box] for box in unit), sorted(geometry.digits))
+        for box, char in zip(geometry.boxes, grid or ''):
+            if char != '.':
+                self.assertEqual(values[box], char)
+
+    def test_tables(self):
+        for size, units in ((4, 12), (9, 27), (16, 48), (25, 75)):
+            geometry = variants.variant('classic', size)
+            self.assertEqual(len(geometry.boxes), size * size)
+            self.assertEqual(len(geometry.unitlist), units)
+            self.assertEqual(len(geometry.peers[0]), 3 * size - 2 * geometry.side - 1)
+            self.assertEqual(geometry.popcount[geometry.all_digits], size)
+        self.assertEqual(len(variants.variant('diagonal').peers[0]), 26)
+        self.assertEqual(len(variants.variant('windoku').unitlist), 31)
+        self.assertEqual(variants.variant('classic').peers, solution.classic_geometry.peers)
+        self.assertEqual(len(solution.diagonal_geometry.box_shared_units['A1', 'B2']), 2)
+        self.assertNotIn(('A2', 'I9'), solution.diagonal_geometry.box_shared_units)
+
+    def test_cached(self):
+        self.assertIs(variants.variant('windoku', 9), variants.variant('windoku', 9))
+        geometry = variants.variant('classic', 16)
+        self.assertIs(pickle.loads(pickle.dumps(geometry)), geometry)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, variants.variant, 'classic', 10)
+        self.assertRaises(ValueError, variants.variant, 'nope')
+        self.assertRaises(ValueError, variants.variant, 'jigsaw', 4)
+        self.assertRaises(ValueError, variants.variant, 'jigsaw', 4, 'A' * 16)
+
+    def test_side_by_side(self):
+        diagonal = solution.solve(self.diagonal_grid, variant='diagonal')
+        classic = solution.solve(self.diagonal_grid, variant='classic')
+        self.assertSolved(diagonal, variants.variant('diagonal'), self.diagonal_grid)
+        self.assertSolved(classic, variants.variant('classic'), self.diagonal_grid)
+
+    def test_sizes(self):
+        grids = {4: '..1.4.3212...4.1',
+                 16: '.6..B.7..F.5.....15.......D2..3BC..D.1..3.B48.6A7..BD.C2.9.8.F.E89B6.74.F5.........3.C2E...'
+                     'B.5F....G1F5A743D.89.5F...9......D4.....4..1FB38..6A.....5.6....C.3B86.95..37E1.FC.D4..7.4DGCA'
+                     '65....2.4...2...B9..A5.B.3.......F61...A...9....EC.G.4.E2....A.4D.G.B..'}
+        for size, grid in grids.items():
+            geometry = variants.variant('classic', size)
+            for search_mode in solution.search_modes:
+                self.assertSolved(solution.solve(grid, search_mode, variant=geometry), geometry, grid)
+
+    def test_extra_regions(self):
+        for geometry in (variants.variant('windoku'), variants.variant('jigsaw', 4, self.jigsaw_regions)):
+            empty = '.' * len(geometry.boxes)
+            self.assertSolved(solution.solve(empty, variant=geometry), geometry)
+            self.assertSolved(solution.search(solution.grid_values(empty, geometry), variant=geometry), geometry)
+
+
+if __name__ == '__main__':
+    unittest.main()
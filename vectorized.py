@@ -0,0 +1,204 @@
+"""
+NumPy-vectorized constraint propagation over many boards at once.
+
+A batch of N boards is an (N, cells) uint16 array of candidate masks, laid out like the
+boards of bitboard.py, so boards up to 16 x 16 fit. propagate_batch() runs the eliminate
+and only_choice rules on every board still changing with a handful of array operations
+per round, using the peer and unit tables of a variants.Geometry as index arrays.
+solve_batch() hands the boards that stall before being solved to the scalar bitboard
+search. solve_boards() does the same for boards that are already masks, e.g. memory-mapped
+from a packed corpus (see corpus.py).
+
+NumPy is optional for the rest of the solver; only this module and corpus.py import it.
+"""
+import numpy as np
+
+import bitboard
+import solution
+
+# status codes returned by propagate_batch
+STALLED, SOLVED, INVALID = 0, 1, 2
+
+_tables = {}
+
+
+class BatchTables:
+    """
+    Index arrays for a geometry. Ragged tables are padded with the index of an extra
+    always-zero column, so boards are gathered with one extra column on the right.
+    Args:
+        geometry(variants.Geometry): unit and peer tables
+    """
+
+    def __init__(self, geometry):
+        if geometry.size > 16:
+            raise ValueError('{!r} does not fit 16-bit masks'.format(geometry))
+        cells = len(geometry.boxes)
+        self.cells = cells
+        self.all_digits = geometry.all_digits
+        self.popcount = np.array(geometry.popcount, dtype=np.uint8)
+        # candidate mask of every character of a grid string
+        self.symbols = np.full(256, geometry.all_digits, dtype=np.uint16)
+        for digit, mask in geometry.digit_masks.items():
+            self.symbols[ord(digit)] = mask
+        self.valid = np.zeros(256, dtype=bool)
+        for char in geometry.digits + '.0':
+            self.valid[ord(char)] = True
+
+        width = max(len(peers) for peers in geometry.peers)
+        self.peers = np.full((cells, width), cells, dtype=np.intp)
+        for cell, peers in enumerate(geometry.peers):
+            self.peers[cell, :len(peers)] = peers
+
+        self.units = np.array(geometry.unitlist, dtype=np.intp)
+        # slots[cell] indexes the flattened (unit, position) entries that hold the cell
+        unit_size = self.units.shape[1]
+        padding = self.units.size
+        width = max(len(units) for units in geometry.cell_units)
+        self.slots = np.full((cells, width), padding, dtype=np.intp)
+        for cell, units in enumerate(geometry.cell_units):
+            for i, u in enumerate(units):
+                self.slots[cell, i] = u * unit_size + geometry.unitlist[u].index(cell)
+
+
+def tables_for(geometry):
+    """BatchTables for a geometry, built once and cached."""
+    if id(geometry) not in _tables:
+        _tables[id(geometry)] = (geometry, BatchTables(geometry))
+    return _tables[id(geometry)][1]
+
+
+def grids_to_masks(grids, geometry=None):
+    """
+    Parse grids into a batch of candidate masks.
+    Args:
+        grids(list): strings with one character per box, '.' or '0' for empty boxes
+        geometry(variants.Geometry): the digits and size of the grids. Default: solution.geometry
+    Returns:
+        an (N, cells) uint16 array
+    Raises:
+        ValueError: if a grid has the wrong length or a character that is not a digit, '.' or '0'
+    """
+
+    tables = tables_for(geometry or solution.geometry)
+    for i, grid in enumerate(grids):
+        if len(grid) != tables.cells:
+            raise ValueError('grid {} has {} boxes, expected {}'.format(i, len(grid), tables.cells))
+    try:
+        data = ''.join(grids).encode('ascii')
+    except UnicodeEncodeError:
+        raise ValueError('grids must be ASCII')
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(len(grids), tables.cells)
+    invalid = ~tables.valid[raw].all(axis=1)
+    if invalid.any():
+        raise ValueError('grid {} has characters other than digits, . and 0'.format(int(np.argmax(invalid))))
+    return tables.symbols[raw]
+
+
+def _step(boards, tables):
+    """One round of eliminate and only_choice. Returns (new boards, invalid flags)."""
+    n = len(boards)
+    padded = np.concatenate([boards, np.zeros((n, 1), dtype=np.uint16)], axis=1)
+
+    # eliminate: clear the digits of solved peers
+    popcount = tables.popcount
+    solved = np.where(popcount[padded] == 1, padded, 0).astype(np.uint16)
+    taken = np.bitwise_or.reduce(solved[:, tables.peers], axis=2)
+    boards = boards & ~taken
+
+    # only_choice: a digit seen exactly once in a unit goes into that cell
+    in_units = boards[:, tables.units]
+    seen_once = np.zeros(in_units.shape[:2], dtype=np.uint16)
+    seen_twice = np.zeros_like(seen_once)
+    for position in range(in_units.shape[2]):
+        masks = in_units[:, :, position]
+        seen_twice |= seen_once & masks
+        seen_once |= masks
+    invalid = (seen_once != tables.all_digits).any(axis=1)
+    only = seen_once & ~seen_twice
+    hits = (in_units & only[:, :, np.newaxis]).reshape(n, -1)
+    hits = np.concatenate([hits, np.zeros((n, 1), dtype=np.uint16)], axis=1)
+    forced = np.bitwise_or.reduce(hits[:, tables.slots], axis=2)
+    # two digits forced into one cell cannot both be placed
+    invalid |= (popcount[forced] > 1).any(axis=1)
+    boards = np.where(forced != 0, forced, boards)
+
+    invalid |= (boards == 0).any(axis=1)
+    return boards, invalid
+
+
+def propagate_batch(boards, geometry=None):
+    """
+    Apply eliminate and only_choice to every board until none of them changes.
+    Args:
+        boards(array): (N, cells) uint16 candidate masks, modified in place
+        geometry(variants.Geometry): unit and peer tables. Default: solution.geometry
+    Returns:
+        an (N,) uint8 array of STALLED, SOLVED or INVALID per board
+    """
+
+    tables = tables_for(geometry or solution.geometry)
+    status = np.full(len(boards), STALLED, dtype=np.uint8)
+    active = np.arange(len(boards))
+    while len(active):
+        before = boards[active]
+        after, invalid = _step(before, tables)
+        boards[active] = after
+        status[active[invalid]] = INVALID
+        changed = (after != before).any(axis=1) & ~invalid
+        active = active[changed]
+
+    unsolved = (tables.popcount[boards] != 1).any(axis=1)
+    status[(status == STALLED) & ~unsolved] = SOLVED
+    return status
+
+
+def solve_batch(grids, geometry=None, batch_size=4096):
+    """
+    Solve many grids, propagating them together and searching the ones that stall.
+    Args:
+        grids(list): sudoku grids as strings
+        geometry(variants.Geometry): unit and peer tables. Default: solution.geometry
+        batch_size(int): boards propagated per array operation
+    Returns:
+        a list with, for every grid, the solution in dictionary form or False
+    """
+
+    geometry = geometry or solution.geometry
+    results = []
+    for start in range(0, len(grids), batch_size):
+        results.extend(_solve(grids_to_masks(grids[start:start + batch_size], geometry), geometry))
+    return results
+
+
+def solve_boards(boards, geometry=None, batch_size=4096):
+    """
+    Solve boards already in candidate-mask form, such as the records of a packed corpus in
+    the mask layout (corpus.PackedCorpus.masks()), which are read from the mapped file
+    without parsing. Only one batch at a time is copied; `boards` is not modified.
+    Args:
+        boards(array): (N, cells) uint16 candidate masks
+        geometry(variants.Geometry): unit and peer tables. Default: solution.geometry
+        batch_size(int): boards propagated per array operation
+    Returns:
+        a list with, for every board, the solution in dictionary form or False
+    """
+
+    geometry = geometry or solution.geometry
+    results = []
+    for start in range(0, len(boards), batch_size):
+        results.extend(_solve(np.array(boards[start:start + batch_size], dtype=np.uint16), geometry))
+    return results
+
+
+def _solve(boards, geometry):
+    """Propagate a batch of boards in place and search the ones that stall."""
+    status = propagate_batch(boards, geometry)
+    results = []
+    for board, state in zip(boards.tolist(), status):
+        if state == STALLED:
+            board = bitboard.search_in_place(board, geometry)
+        elif state == INVALID:
+            board = False
+        results.append(board and bitboard.to_values(board, geometry))
+    return results
@@ -0,0 +1,35 @@
+import solution
+import unittest
+
+try:
+    import vectorized
+except ImportError:
+    vectorized = None
+
+
+@unittest.skipIf(vectorized is None, 'NumPy is not installed')
+class TestVectorized(unittest.TestCase):
+    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    hard_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+
+    def test_grids_to_masks(self):
+        masks = vectorized.grids_to_masks([self.diagonal_grid, '0' * 81])
+        self.assertEqual(masks.shape, (2, 81))
+        self.assertEqual(masks[0, 0], 0b10)
+        self.assertEqual(masks[0, 1], 0b111111111)
+        self.assertTrue((masks[1] == 0b111111111).all())
+        self.assertRaises(ValueError, vectorized.grids_to_masks, ['.' * 80, '.' * 82])
+        self.assertRaises(ValueError, vectorized.solve_batch, ['x' * 81])
+
+    def test_propagate_batch(self):
+        boards = vectorized.grids_to_masks([self.diagonal_grid, self.hard_grid, '11' + '.' * 79, '.' * 81])
+        status = vectorized.propagate_batch(boards)
+        self.assertEqual(list(status), [vectorized.SOLVED, vectorized.STALLED, vectorized.INVALID, vectorized.STALLED])
+
+    def test_solve_batch(self):
+        grids = [self.diagonal_grid, self.hard_grid, '11' + '.' * 79] * 3
+        self.assertEqual(vectorized.solve_batch(grids, batch_size=4), [solution.solve(grid) for grid in grids])
+
+
+if __name__ == '__main__':
+    unittest.main()